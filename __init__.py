@@ -2,4 +2,5 @@
 
 from . import models
 from . import utils
+from . import cli
 from . import tests
@@ -12,7 +12,7 @@
     'author': "Hersyanda Putra Adi",
     'website': "http://www.hrsynd.site",
     'category': 'Uncategorized',
-    'version': '1.0',
+    'version': '1.1',
     'installable': True,
     'application': True,
 
@@ -26,6 +26,9 @@
         'migration_list/migration_list.xml',
         'views/reschedule_wizard_view.xml',
         'views/data_migration_view.xml',
+        'views/data_migration_run_view.xml',
+        'views/data_migration_job_view.xml',
+        'data/migration_dispatcher_cron.xml',
 
         # IMPORTANT : ALWAYS PUT THIS XML AT THE END OF THE DATA LIST
         'migration_list/migration_trigger.xml'
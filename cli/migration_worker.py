@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import select
+import signal
+import threading
+
+import odoo
+from odoo import SUPERUSER_ID, api
+from odoo.cli import Command
+from odoo.tools.config import config
+
+from ..models.data_migration_job import JOB_CHANNEL
+from ..utils.settings import get_float_option, get_int_option
+
+_logger = logging.getLogger(__name__)
+
+
+class MigrationJobRunner(object):
+    """ Consume the migration job queue of a database with concurrency worker
+    threads. Workers take jobs until no job is ready, then wait for a
+    notification on the job channel, or poll_interval seconds at most.
+    """
+
+    def __init__(self, db_name, concurrency=1, poll_interval=60.0):
+        self.db_name = db_name
+        self.concurrency = max(concurrency, 1)
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.stopping = False
+
+    def stop(self, *args):
+        """ Stop taking new jobs, running jobs are finished first. """
+        _logger.info('Stopping migration job runner.')
+        self.stopping = True
+        with self.condition:
+            self.condition.notify_all()
+
+    def run(self):
+        """ Start the workers, then listen to the job channel until stopped. """
+        with api.Environment.manage():
+            # Load the registry once before the workers use it
+            odoo.registry(self.db_name)
+        workers = [
+            threading.Thread(
+                target=self._run_worker,
+                name='odoo.data.migration.worker.{}'.format(index),
+                daemon=True)
+            for index in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        _logger.info(
+            'Migration job runner started on database {} with {} worker.'.format(
+                self.db_name, self.concurrency))
+
+        self._listen()
+        for worker in workers:
+            worker.join()
+
+    def _listen(self):
+        """ Wake up the workers on every notification of the job channel. """
+        connection = odoo.sql_db.db_connect(self.db_name)
+        with connection.cursor() as cr:
+            cr.execute('LISTEN {}'.format(JOB_CHANNEL))
+            cr.commit()
+            cnx = cr._cnx
+            while not self.stopping:
+                # Short timeout, so stop is handled quickly
+                if select.select([cnx], [], [], 1.0) == ([], [], []):
+                    continue
+                cnx.poll()
+                if cnx.notifies:
+                    del cnx.notifies[:]
+                    with self.condition:
+                        self.condition.notify_all()
+
+    def _run_worker(self):
+        """ Take and run jobs until the runner is stopped. """
+        while not self.stopping:
+            try:
+                is_job_run = self._run_next_job()
+            except Exception:
+                _logger.exception('Migration job runner failed to run a job.')
+                is_job_run = False
+            if not is_job_run:
+                with self.condition:
+                    if not self.stopping:
+                        self.condition.wait(self.poll_interval)
+
+    def _run_next_job(self):
+        """ Run the next ready job in a new cursor. Return False when no job
+        is ready.
+        """
+        with api.Environment.manage():
+            registry = odoo.registry(self.db_name).check_signaling()
+            with registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                job = env['odoo.data.migration.job']._acquire_job()
+                if not job:
+                    return False
+                job.run_job()
+                return True
+
+
+class DataMigrationWorker(Command):
+    """ Run queued data migration jobs """
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(
+            prog='odoo-bin datamigrationworker',
+            description='Run migration jobs enqueued in the job queue of Odoo Data'
+                        ' Migration Tools. Other arguments, e.g. -c and -d, are used'
+                        ' as server configuration.')
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Number of jobs run at the same time. Default to'
+                 ' data_migration_job_concurrency option of config file, or 1.')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Seconds between checks of the job queue without notification.'
+                 ' Default to data_migration_job_poll_interval option of config'
+                 ' file, or 60.')
+        options, server_args = parser.parse_known_args(args)
+        config.parse_config(server_args)
+        if not config['db_name']:
+            parser.error('Database is required, use -d or db_name option of config file.')
+
+        runner = MigrationJobRunner(
+            config['db_name'],
+            concurrency=options.concurrency or get_int_option(
+                'data_migration_job_concurrency', 1),
+            poll_interval=options.poll_interval or get_float_option(
+                'data_migration_job_poll_interval', 60.0))
+        signal.signal(signal.SIGINT, runner.stop)
+        signal.signal(signal.SIGTERM, runner.stop)
+        runner.run()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """ Remove ir.cron record created for every scheduled migration. Scheduled
+    migrations are now run by a single dispatcher cron.
+    """
+    if not version:
+        return
+
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'odoo_data_migration'
+            AND column_name = 'ir_cron_reference'
+    """)
+    if not cr.fetchone():
+        return
+
+    cr.execute("""
+        SELECT ir_cron_reference FROM odoo_data_migration
+        WHERE ir_cron_reference IS NOT NULL
+    """)
+    cron_ids = [row[0] for row in cr.fetchall()]
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['ir.cron'].browse(cron_ids).exists().unlink()
+    cr.execute('ALTER TABLE odoo_data_migration DROP COLUMN ir_cron_reference')
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from . import data_migration_model
+from . import data_migration_batch
+from . import data_migration_index
+from . import data_migration_job
+from . import data_migration_partition
+from . import data_migration_progress
+from . import data_migration_run
 from . import data_migration_test
 from . import reschedule_wizard
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class OdooDataMigrationBatch(models.Model):
+    _name = 'odoo.data.migration.batch'
+    _description = 'Odoo Data Migration Batch'
+    _log_access = False
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    committed_at = fields.Datetime(
+        'Committed At', index=True,
+        help='Start time of the transaction of the batch, write_date of the records\
+             it wrote. Stored to the microsecond.')
+
+    ####################################
+    # Utils
+    ####################################
+
+    @api.model
+    def _add_batch(self, migration_id):
+        """ Record the current transaction as a batch of the migration. Written
+        in SQL, the ORM would truncate the time to the second.
+        """
+        self.env.cr.execute("""
+            INSERT INTO odoo_data_migration_batch (migration_id, committed_at)
+            VALUES (%s, now() at time zone 'UTC')
+        """, (migration_id,))
+
+    @api.model
+    def _get_written_ids(self, migration_id, records):
+        """ Return ids of records whose write_date is the time of a batch of the
+        migration, records written by the migration and not changed since.
+        """
+        if not records:
+            return []
+        self.env.cr.execute("""
+            SELECT target.id FROM "{}" target
+            JOIN odoo_data_migration_batch batch
+                ON batch.committed_at = target.write_date
+            WHERE batch.migration_id = %s AND target.id IN %s
+        """.format(records._table), (migration_id, tuple(records.ids)))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _clean_batches(self, migration_id, watermark=False):
+        """ Drop batches of the migration committed up to watermark, their
+        records are left out by the watermark. Every batch without watermark.
+        """
+        self.env.cr.execute("""
+            DELETE FROM odoo_data_migration_batch
+            WHERE migration_id = %s AND (%s IS NULL OR committed_at <= %s)
+        """, (migration_id, watermark or None, watermark or None))
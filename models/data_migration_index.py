@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from contextlib import contextmanager
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError, ValidationError
+
+from ..utils.enum import eTableObjectType
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooDataMigrationIndex(models.Model):
+    _name = 'odoo.data.migration.index'
+    _description = 'Odoo Data Migration Index'
+    _order = 'sequence, id'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer('Sequence', default=10)
+    object_type = fields.Selection(
+        string='Type',
+        selection=[
+            (eTableObjectType.index.name,
+             'Index'),
+            (eTableObjectType.constraint.name,
+             'Constraint'),
+            (eTableObjectType.trigger.name,
+             'Trigger')],
+        required=True,
+        default=eTableObjectType.index.name,
+        help='Index and constraint are dropped before the run and rebuilt after it,\
+             trigger is disabled before the run and enabled after it.')
+    object_name = fields.Char('Name', required=True)
+    table_name = fields.Char(
+        'Table',
+        help='Table of the index, constraint or trigger. Default to source model table.')
+    definition = fields.Text(
+        'Definition', readonly=True,
+        help='Definition saved when the index or constraint was dropped, used to\
+             rebuild it.')
+    is_dropped = fields.Boolean(
+        'Dropped', readonly=True,
+        help='Index or constraint is dropped, or trigger is disabled, and waits to\
+             be restored.')
+
+    ####################################
+    # Constrains
+    ####################################
+    @api.constrains('object_name', 'table_name')
+    def _validate_object_name(self):
+        """ Validate names can be quoted as SQL identifiers. """
+        for record in self:
+            if any('"' in (name or '') for name in (record.object_name, record.table_name)):
+                raise ValidationError(
+                    'Name of index, constraint, trigger and table can not contain double quote.')
+
+    @api.constrains('migration_id')
+    def _validate_migration(self):
+        self.mapped('migration_id')._validate_index_ids()
+
+    ####################################
+    # Drop and restore
+    ####################################
+
+    @contextmanager
+    def _ddl_env(self):
+        """ Yield environment of a separate autocommit cursor. DDL and the state
+        of the managed objects are committed statement by statement, so they are
+        not lost if the migration crashes, and CREATE INDEX CONCURRENTLY can run.
+        The migration cursor must not hold locks on the managed tables.
+        """
+        with self.pool.cursor() as cr:
+            cr.autocommit(True)
+            yield self.env(cr=cr)
+
+    def _get_table_name(self):
+        """ Return table of the managed object. """
+        self.ensure_one()
+        return self.table_name or self.env[self.migration_id.model_name]._table
+
+    def _drop(self, lock_timeout=0.0):
+        """ Save the definition of the managed indexes and constraints, then drop
+        them, and disable the managed triggers. Objects already dropped by an
+        interrupted run are skipped. DDL waits for its table lock lock_timeout
+        seconds at most, so it doesn't block the writers queued behind it.
+        Return the table names.
+        """
+        table_names = set()
+        with self._ddl_env() as ddl_env:
+            if lock_timeout:
+                ddl_env.cr.execute("SELECT set_config('lock_timeout', %s, false)", (
+                    '{}ms'.format(int(lock_timeout * 1000)),))
+            for record in self.with_env(ddl_env):
+                table_name = record._get_table_name()
+                table_names.add(table_name)
+                if record.is_dropped:
+                    continue
+                # Save the definition before it is lost
+                record.write({
+                    'definition': record._get_definition(table_name),
+                    'is_dropped': True
+                })
+                record.flush()
+                _logger.info('\nMIGRATION : {} \nDROPPING {} : {}'.format(
+                    record.migration_id.name, record.object_type.upper(),
+                    record.object_name))
+                if record.object_type == eTableObjectType.index.name:
+                    ddl_env.cr.execute('DROP INDEX "{}"'.format(record.object_name))
+                elif record.object_type == eTableObjectType.constraint.name:
+                    ddl_env.cr.execute('ALTER TABLE "{}" DROP CONSTRAINT "{}"'.format(
+                        table_name, record.object_name))
+                else:
+                    ddl_env.cr.execute('ALTER TABLE "{}" DISABLE TRIGGER "{}"'.format(
+                        table_name, record.object_name))
+        # Managed objects were written by the DDL cursor
+        self.invalidate_cache()
+        return table_names
+
+    def _get_definition(self, table_name):
+        """ Return definition of the managed index or constraint, or raise
+        UserError if it doesn't exist.
+        """
+        self.ensure_one()
+        if self.object_type == eTableObjectType.index.name:
+            self.env.cr.execute("""
+                SELECT pg_get_indexdef(idx.indexrelid), con.conname
+                FROM pg_index idx
+                JOIN pg_class cls ON cls.oid = idx.indexrelid
+                LEFT JOIN pg_constraint con ON con.conindid = idx.indexrelid
+                WHERE idx.indrelid = to_regclass(%s) AND cls.relname = %s
+            """, ('"{}"'.format(table_name), self.object_name))
+        elif self.object_type == eTableObjectType.constraint.name:
+            self.env.cr.execute("""
+                SELECT pg_get_constraintdef(oid), NULL FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND conname = %s
+            """, ('"{}"'.format(table_name), self.object_name))
+        else:
+            self.env.cr.execute("""
+                SELECT NULL, NULL FROM pg_trigger
+                WHERE tgrelid = to_regclass(%s) AND tgname = %s AND NOT tgisinternal
+            """, ('"{}"'.format(table_name), self.object_name))
+        row = self.env.cr.fetchone()
+        if not row:
+            raise UserError('{} {} does not exist on table {}.'.format(
+                self.object_type.capitalize(), self.object_name, table_name))
+        definition, constraint_name = row
+        if constraint_name:
+            raise UserError(
+                'Index {} belongs to constraint {}, manage the constraint instead.'.format(
+                    self.object_name, constraint_name))
+        return definition
+
+    def _restore(self, analyze_table_names=()):
+        """ Rebuild the dropped indexes with CREATE INDEX CONCURRENTLY and the
+        dropped constraints, enable the disabled triggers, then ANALYZE their
+        tables and analyze_table_names. Every object is restored even if
+        another one fails, UserError listing the failures is raised at the end.
+        """
+        table_names = set(analyze_table_names)
+        errors = []
+        with self._ddl_env() as ddl_env:
+            for record in self.with_env(ddl_env):
+                table_name = record._get_table_name()
+                table_names.add(table_name)
+                if not record.is_dropped:
+                    continue
+                _logger.info('\nMIGRATION : {} \nRESTORING {} : {}'.format(
+                    record.migration_id.name, record.object_type.upper(),
+                    record.object_name))
+                try:
+                    record._restore_object(table_name)
+                except Exception as e:
+                    _logger.exception('\nMIGRATION : {} \nRESTORE FAILED : {}'.format(
+                        record.migration_id.name, record.object_name))
+                    errors.append('{} {}: {}'.format(
+                        record.object_type.capitalize(), record.object_name, e))
+                    continue
+                record.write({
+                    'is_dropped': False
+                })
+                record.flush()
+
+            for table_name in sorted(table_names):
+                ddl_env.cr.execute('ANALYZE "{}"'.format(table_name))
+        self.invalidate_cache()
+        if errors:
+            raise UserError('Restore failed, restore again once fixed.\n{}'.format(
+                '\n'.join(errors)))
+
+    def _restore_object(self, table_name):
+        """ Restore a single dropped index, constraint or disabled trigger. Can
+        be run again after an interrupted restore.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        if self.object_type == eTableObjectType.index.name:
+            # Drop leftover of an interrupted concurrent build, it is invalid
+            cr.execute("""
+                SELECT 1 FROM pg_index idx
+                JOIN pg_class cls ON cls.oid = idx.indexrelid
+                WHERE idx.indrelid = to_regclass(%s) AND cls.relname = %s
+                    AND NOT idx.indisvalid
+            """, ('"{}"'.format(table_name), self.object_name))
+            if cr.fetchone():
+                cr.execute('DROP INDEX CONCURRENTLY "{}"'.format(self.object_name))
+            cr.execute(re.sub(
+                r'^CREATE (UNIQUE )?INDEX ', r'CREATE \1INDEX CONCURRENTLY IF NOT EXISTS ',
+                self.definition))
+        elif self.object_type == eTableObjectType.constraint.name:
+            cr.execute("""
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND conname = %s
+            """, ('"{}"'.format(table_name), self.object_name))
+            if cr.fetchone():
+                return
+            if self.definition.startswith(('FOREIGN KEY', 'CHECK')):
+                # Validate without blocking writes on the table
+                definition = self.definition
+                if definition.endswith(' NOT VALID'):
+                    definition = definition[:-len(' NOT VALID')]
+                cr.execute('ALTER TABLE "{}" ADD CONSTRAINT "{}" {} NOT VALID'.format(
+                    table_name, self.object_name, definition))
+                cr.execute('ALTER TABLE "{}" VALIDATE CONSTRAINT "{}"'.format(
+                    table_name, self.object_name))
+            else:
+                cr.execute('ALTER TABLE "{}" ADD CONSTRAINT "{}" {}'.format(
+                    table_name, self.object_name, self.definition))
+        else:
+            cr.execute('ALTER TABLE "{}" ENABLE TRIGGER "{}"'.format(
+                table_name, self.object_name))
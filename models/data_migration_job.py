@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+
+from ..utils.enum import eMigrationStatus
+from ..utils.lock import lock_held_condition
+
+_logger = logging.getLogger(__name__)
+
+# Channel notified when jobs are enqueued, listened by the migration job runner
+JOB_CHANNEL = 'odoo_data_migration_job'
+
+
+class OdooDataMigrationJob(models.Model):
+    _name = 'odoo.data.migration.job'
+    _description = 'Odoo Data Migration Job'
+    _order = 'id desc'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    job_status = fields.Selection(
+        selection=[
+            (eMigrationStatus.queued.name,
+             'Queued'),
+            (eMigrationStatus.running.name,
+             'Running'),
+            (eMigrationStatus.done.name,
+             'Done'),
+            (eMigrationStatus.failed.name,
+             'Failed'),
+            (eMigrationStatus.cancelled.name,
+             'Cancelled')],
+        default=eMigrationStatus.queued.name,
+        required=True,
+        index=True)
+    started_at = fields.Datetime('Started At', readonly=True)
+    finished_at = fields.Datetime('Finished At', readonly=True)
+    worker_name = fields.Char(
+        'Worker', readonly=True,
+        help='Host and process id of the job runner that took the job.')
+    error_message = fields.Text('Error Message', readonly=True)
+
+    ####################################
+    # Queue
+    ####################################
+
+    @api.model
+    def _enqueue(self, migrations):
+        """ Create a job for every migration record that doesn't have a queued or
+        running job yet, then notify the job runners. The notification is sent
+        when the transaction is committed. Return the created job records.
+        """
+        pending_data = self.search([
+            ('migration_id', 'in', migrations.ids),
+            ('job_status', 'in', [eMigrationStatus.queued.name,
+                                  eMigrationStatus.running.name])
+        ])
+        new_migrations = migrations - pending_data.mapped('migration_id')
+        job_data = self.create([{
+            'migration_id': migration.id
+        } for migration in new_migrations])
+        if job_data:
+            self.env.cr.execute('NOTIFY {}'.format(JOB_CHANNEL))
+        _logger.info('\nEnqueued {} migration job.'.format(len(job_data)))
+        return job_data
+
+    @api.model
+    def _acquire_job(self):
+        """ Take the oldest queued job whose migration dependencies are done,
+        mark it running and commit, so other job runners skip it. Jobs left
+        running by a crashed runner for longer than the lease timeout are taken
+        again. Jobs waiting on a dependency that will not run are skipped, and
+        jobs of cancelled migrations are never taken. Return the acquired job
+        record, empty if none is ready.
+        """
+        stale_time = fields.Datetime.now() - timedelta(
+            seconds=self.env['odoo.data.migration']._get_lease_timeout())
+        self.env.cr.execute("""
+            UPDATE odoo_data_migration_job
+            SET job_status = %(running)s, started_at = %(now)s, finished_at = NULL,
+                worker_name = %(worker_name)s, error_message = NULL
+            WHERE id = (
+                SELECT job.id FROM odoo_data_migration_job job
+                WHERE (job.job_status = %(queued)s OR (
+                        job.job_status = %(running)s
+                        AND job.started_at < %(stale_time)s
+                        AND NOT {}))
+                    AND NOT EXISTS (
+                        SELECT 1 FROM odoo_data_migration migration
+                        WHERE migration.id = job.migration_id
+                            AND migration.migration_status = %(cancelled)s)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM odoo_data_migration_dependency_rel rel
+                        JOIN odoo_data_migration dependency
+                            ON dependency.id = rel.dependency_id
+                        WHERE rel.migration_id = job.migration_id
+                            AND dependency.migration_status != %(done)s)
+                ORDER BY job.id
+                LIMIT 1
+                FOR UPDATE OF job SKIP LOCKED
+            )
+            RETURNING id
+        """.format(lock_held_condition('job.migration_id')), {
+            'running': eMigrationStatus.running.name,
+            'queued': eMigrationStatus.queued.name,
+            'done': eMigrationStatus.done.name,
+            'cancelled': eMigrationStatus.cancelled.name,
+            'now': fields.Datetime.now(),
+            'stale_time': stale_time,
+            'worker_name': '{}:{}'.format(socket.gethostname(), os.getpid())
+        })
+        job_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not job_ids:
+            self._skip_blocked_job()
+        self.env.cr.commit()
+        # Jobs were written in SQL
+        self.invalidate_cache()
+        return self.browse(job_ids)
+
+    @api.model
+    def _skip_blocked_job(self):
+        """ Skip queued jobs depending on a migration that is not done, and has
+        no queued or running job to get it done.
+        """
+        self.env.cr.execute("""
+            UPDATE odoo_data_migration_job job
+            SET job_status = %(failed)s, finished_at = %(now)s,
+                error_message = 'Skipped, dependency is not done.'
+            WHERE job.job_status = %(queued)s AND EXISTS (
+                SELECT 1 FROM odoo_data_migration_dependency_rel rel
+                JOIN odoo_data_migration dependency
+                    ON dependency.id = rel.dependency_id
+                WHERE rel.migration_id = job.migration_id
+                    AND dependency.migration_status NOT IN (%(done)s, %(running)s)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM odoo_data_migration_job dependency_job
+                        WHERE dependency_job.migration_id = dependency.id
+                            AND dependency_job.job_status IN (%(queued)s, %(running)s)))
+        """, {
+            'failed': eMigrationStatus.failed.name,
+            'queued': eMigrationStatus.queued.name,
+            'running': eMigrationStatus.running.name,
+            'done': eMigrationStatus.done.name,
+            'now': fields.Datetime.now()
+        })
+        if self.env.cr.rowcount:
+            _logger.warning(
+                '\nSkipped {} migration job, dependency is not done.'.format(
+                    self.env.cr.rowcount))
+            # Jobs depending on the skipped jobs may be skipped too
+            self._skip_blocked_job()
+
+    def run_job(self):
+        """ Run the migration of an acquired job, then store the job result. """
+        self.ensure_one()
+        migration = self.migration_id
+        _logger.info('\nRUNNING MIGRATION JOB #{} \nMIGRATION : {}'.format(
+            self.id, migration.name))
+        try:
+            migration.run_migration()
+        except UserError as e:
+            # Migration is claimed by another worker, cron or node
+            self.env.cr.rollback()
+            error_message = e.args[0]
+        else:
+            error_message = migration.error_traceback \
+                if migration.migration_status == eMigrationStatus.failed.name else False
+
+        self.write({
+            'job_status': eMigrationStatus.failed.name if error_message
+            else eMigrationStatus.done.name,
+            'finished_at': fields.Datetime.now(),
+            'error_message': error_message
+        })
+        self.env.cr.commit()
+        return not error_message
+
+    def cancel_job(self):
+        """ Cancel queued jobs, they won't be taken by the job runners. """
+        self.filtered(
+            lambda job: job.job_status == eMigrationStatus.queued.name).write({
+                'job_status': eMigrationStatus.cancelled.name
+            })
@@ -1,19 +1,47 @@
 # -*- coding: utf-8 -*-
 
+import base64
 import logging
+import math
+import time
 import traceback
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 import pytz
 from odoo import api, fields, models
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
 from odoo.tools.config import config
+from odoo.tools.safe_eval import safe_eval
 
-from ..utils.enum import eMigrationStatus, eRunningMethod
+from ..utils.dag import topological_layers
+from ..utils.dry_run import DryRunRollback, prevent_commit
+from ..utils.enum import (eExecutionMode, eFileFormat, eMigrationStatus,
+                          eMigrationType, eRunningMethod)
+from ..utils.file_source import (STAGING_TABLE, count_records, iter_copy_batches,
+                                 read_columns)
+from ..utils.instrumentation import MigrationMetrics
+from ..utils.lock import advisory_locks, lock_held_condition
+from ..utils.profiler import MigrationProfiler
+from ..utils.retry import MigrationRetry
+from ..utils.settings import get_bool_option, get_float_option, get_int_option
+from ..utils.throttle import MigrationThrottle
 from ..utils.timezone_convert import convert_datetime_data
 
 _logger = logging.getLogger(__name__)
 
+# Context of migration payload in fast mode, mail tracking, chatter messages,
+# followers and notifications are skipped
+FAST_MODE_CONTEXT = {
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+    'mail_auto_subscribe_no_notify': True,
+    'no_reset_password': True,
+}
+
 
 class OdooDataMigration(models.Model):
     _name = 'odoo.data.migration'
@@ -24,10 +52,51 @@ class OdooDataMigration(models.Model):
     description = fields.Text('Migration Description')
     model_name_relation = fields.Many2one('ir.model', string='Model Name')
     model_name = fields.Char('Source Model', required=True)
+    migration_type = fields.Selection(
+        string='Migration Type',
+        selection=[
+            (eMigrationType.function.name,
+             'Model Function'),
+            (eMigrationType.sql.name,
+             'SQL Statement'),
+            (eMigrationType.file.name,
+             'File Import')],
+        required=True,
+        default=eMigrationType.function.name,
+        help='Model Function calls the migration function through the ORM.\
+             SQL Statement runs migration SQL directly in batches of source model ids.\
+             File Import loads the source file in batches into a staging table.')
     migration_function = fields.Char(
         'Migration Function',
-        required=True,
-        help='Migration Function Name in Source Model')
+        help='Migration Function Name in Source Model. File import passes the list\
+             of loaded rows of every batch to it.')
+    migration_sql = fields.Text(
+        'Migration SQL',
+        help='SQL statement run for every batch of source model ids. Use %(min_id)s\
+             and %(max_id)s placeholders to restrict the statement to the batch,\
+             without them the statement is run once. File import runs it for every\
+             batch loaded in odoo_data_migration_staging table.')
+    source_file_path = fields.Char(
+        'Source File',
+        help='Path of the CSV or JSONL file imported by file import, on the Odoo server.')
+    source_file_format = fields.Selection(
+        string='Source File Format',
+        selection=[
+            (eFileFormat.csv.name,
+             'CSV'),
+            (eFileFormat.jsonl.name,
+             'JSON Lines')],
+        default=eFileFormat.csv.name,
+        help='CSV file needs a header row, every column is loaded as text column of\
+             the staging table. Every JSON Lines record is loaded in data jsonb column.')
+    sql_invalidate_cache = fields.Boolean(
+        'Invalidate ORM Cache',
+        default=True,
+        help='Invalidate source model fields in the ORM cache after the SQL migration.')
+    sql_invalidate_fields = fields.Char(
+        'Invalidated Fields',
+        help='Comma separated source model fields updated by the SQL migration.\
+             Leave empty to invalidate every field.')
     migration_status = fields.Selection(
         selection=[
             (eMigrationStatus.cancelled.name,
@@ -47,9 +116,57 @@ class OdooDataMigration(models.Model):
     migration_created_date = fields.Datetime('Migration Creation Date')
     scheduled_running_time = fields.Datetime(
         'Scheduled Running Time',
-        help='You need to use reschedule menu to change scheduled\
-                                                 running time for migration that using cron job.')
-    ir_cron_reference = fields.Many2one('ir.cron', string='Ir Cron Record')
+        help='Queued migration that using cron job will be run by the migration\
+             dispatcher cron once this time has passed. Use reschedule menu to\
+             requeue and change scheduled running time of a finished migration.')
+    throttle_max_rows_per_second = fields.Float(
+        'Max Rows per Second',
+        help='Maximum processed records per second of every worker. 0 uses\
+             `data_migration_max_rows_per_second` option of config file.')
+    throttle_batch_sleep = fields.Float(
+        'Sleep Between Batches (s)',
+        help='Sleep after every batch. 0 uses `data_migration_batch_sleep` option of config file.')
+    throttle_max_active_connections = fields.Integer(
+        'Max Active Connections',
+        help='Back off between batches while more connections are active on the database.\
+             0 uses `data_migration_max_active_connections` option of config file.')
+    throttle_max_replication_lag = fields.Float(
+        'Max Replication Lag (s)',
+        help='Back off between batches while a replica is lagging more than this.\
+             0 uses `data_migration_max_replication_lag` option of config file.')
+    lock_timeout = fields.Float(
+        'Lock Timeout (s)',
+        help='Abort a statement of the migration waiting longer than this for a lock,\
+             the batch is retried. 0 uses `data_migration_lock_timeout` option of\
+             config file.')
+    statement_timeout = fields.Float(
+        'Statement Timeout (s)',
+        help='Abort a statement of the migration running longer than this. 0 uses\
+             `data_migration_statement_timeout` option of config file.')
+    dry_run_sample_size = fields.Integer(
+        'Dry Run Sample Size',
+        default=100,
+        help='Number of source records, or ids for SQL migration, run by dry run.')
+    dry_run_date = fields.Datetime('Last Dry Run', readonly=True)
+    estimated_record_count = fields.Integer('Estimated Records', readonly=True)
+    estimated_duration = fields.Float('Estimated Duration (s)', readonly=True)
+    estimated_query_count = fields.Integer('Estimated SQL Queries', readonly=True)
+    run_ids = fields.One2many(
+        'odoo.data.migration.run', 'migration_id', string='Run History',
+        readonly=True)
+    run_count = fields.Integer('Runs', compute='_compute_run_count')
+    job_ids = fields.One2many(
+        'odoo.data.migration.job', 'migration_id', string='Jobs',
+        readonly=True)
+    progress_processed_count = fields.Integer('Processed', compute='_compute_progress')
+    progress_total_count = fields.Integer('Total', compute='_compute_progress')
+    progress_percentage = fields.Float('Progress (%)', compute='_compute_progress')
+    progress_rate = fields.Float('Rate (records/s)', compute='_compute_progress')
+    progress_eta = fields.Datetime('Estimated End', compute='_compute_progress')
+    dependency_ids = fields.Many2many(
+        'odoo.data.migration', 'odoo_data_migration_dependency_rel',
+        'migration_id', 'dependency_id', string='Dependencies',
+        help='Migrations that need to be done before this migration can run.')
     running_method = fields.Selection(
         string='Migration Running Method',
         selection=[
@@ -59,10 +176,136 @@ class OdooDataMigration(models.Model):
              'Cron Job')],
         required=True,
         default=eRunningMethod.at_upgrade.name)
+    execution_mode = fields.Selection(
+        string='Execution Mode',
+        selection=[
+            (eExecutionMode.single.name,
+             'Single Call'),
+            (eExecutionMode.chunked.name,
+             'Chunked'),
+            (eExecutionMode.partitioned.name,
+             'Partitioned')],
+        required=True,
+        default=eExecutionMode.single.name,
+        help='Single Call runs the migration function once on an empty recordset.\
+             Chunked runs it once per batch of target records and commits after each batch.\
+             Partitioned splits target records into id ranges, and runs each range\
+             as chunked migration in its own worker.')
+    target_domain = fields.Char(
+        'Target Domain',
+        default='[]',
+        help='Domain of source model records processed by chunked migration.')
+    batch_size = fields.Integer('Batch Size', default=1000)
+    fast_mode = fields.Boolean(
+        'Fast Mode',
+        help='Run the migration function without mail tracking, chatter messages,\
+             followers and password reset mails. Pending recomputation of stored\
+             fields is flushed once per batch.')
+    profile = fields.Boolean(
+        'Profile',
+        help='Profile the next runs with cProfile and time every SQL statement. The\
+             hotspots and slowest statements are stored on the run history. Only\
+             the migration thread is profiled, not partition workers, and the\
+             profiler slows the migration down.')
+    incremental = fields.Boolean(
+        'Incremental',
+        help='Only process target records changed since the last successful run,\
+             using watermark field. Available for chunked and partitioned migration.')
+    watermark_field = fields.Char(
+        'Watermark Field',
+        default='write_date',
+        help='Source model field compared to the watermark, e.g. write_date or id.\
+             With write_date, records written by the migration itself are left out\
+             of the next run until they are changed again.')
+    watermark_value = fields.Char(
+        'Watermark',
+        readonly=True,
+        copy=False,
+        help='Highest watermark field value of target records at the start of the\
+             last successful run. Next incremental run only processes records past it.')
+    prefetch_fields = fields.Char(
+        'Prefetched Fields',
+        help='Comma separated source model fields read for every batch. When set,\
+             other fields are not prefetched. Leave empty to use default prefetching.')
+    partition_count = fields.Integer(
+        'Partition Count',
+        default=4,
+        help='Number of id ranges, and worker threads, used by partitioned migration.\
+             Can not be greater than `data_migration_partition_workers` option of\
+             config file, default to 4.')
+    partition_ids = fields.One2many(
+        'odoo.data.migration.partition', 'migration_id', string='Partitions',
+        readonly=True)
+    index_ids = fields.One2many(
+        'odoo.data.migration.index', 'migration_id', string='Managed Indexes',
+        help='Indexes and constraints dropped, and triggers disabled, during the run\
+             of batched migration. They are restored after the run, even if it failed.')
+    analyze_after_run = fields.Boolean(
+        'Analyze After Run',
+        help='Run ANALYZE on the source model table after the run. Tables of managed\
+             indexes are always analyzed.')
+    processed_record_count = fields.Integer('Processed Records', readonly=True)
+    last_run_duration = fields.Float('Last Run Duration (s)', readonly=True)
+    throughput = fields.Float('Throughput (records/s)', readonly=True)
+    last_run_cpu_time = fields.Float(
+        'Last Run CPU Time (s)',
+        readonly=True,
+        help='CPU time of the thread running the last run and of its partition\
+             workers.')
+    last_run_query_count = fields.Integer(
+        'Last Run SQL Queries',
+        readonly=True,
+        help='SQL statements of the migration cursor and of the partition worker cursors.')
+    last_run_query_time = fields.Float('Last Run SQL Time (s)', readonly=True)
+    last_run_rows_written = fields.Integer(
+        'Last Run Rows Written',
+        readonly=True,
+        help='Rows affected by INSERT, UPDATE and DELETE statements of the last run,\
+             checkpoints and other statements of the engine are not included.')
+    last_run_memory_peak = fields.Float(
+        'Last Run Peak Memory (MB)',
+        readonly=True,
+        help='Growth of the peak resident memory of the server process during the\
+             last run, 0 when it stayed below a previous peak of the process.')
+    last_run_retry_count = fields.Integer(
+        'Last Run Retries',
+        readonly=True,
+        help='Batches of the last run retried after a deadlock, serialization failure\
+             or lock timeout.')
+    checkpoint_id = fields.Integer(
+        'Checkpoint (Last Processed ID)',
+        readonly=True,
+        help='Highest source record id committed by chunked migration, or number of\
+             records committed by file import. A rerun continues after it, it is\
+             reset when the migration succeed.')
 
     ####################################
     # Compute function
     ####################################
+    @api.depends('run_ids')
+    def _compute_run_count(self):
+        """ Count run history of the migration records. """
+        run_data = self.env['odoo.data.migration.run'].read_group(
+            [('migration_id', 'in', self.ids)], ['migration_id'], ['migration_id'])
+        run_count = {
+            data['migration_id'][0]: data['migration_id_count'] for data in run_data}
+        for record in self:
+            record.run_count = run_count.get(record.id, 0)
+
+    def _compute_progress(self):
+        """ Read progress reported during the last run of the migration records. """
+        progress_data = self.env['odoo.data.migration.progress'].search([
+            ('migration_id', 'in', self.ids)])
+        progress_by_migration = {
+            progress.migration_id.id: progress for progress in progress_data}
+        for record in self:
+            progress = progress_by_migration.get(record.id)
+            record.progress_processed_count = progress.processed_count if progress else 0
+            record.progress_total_count = progress.total_count if progress else 0
+            record.progress_percentage = progress.percentage if progress else 0.0
+            record.progress_rate = progress.rate if progress else 0.0
+            record.progress_eta = progress.eta if progress else False
+
     @api.constrains('running_method', 'scheduled_running_time')
     def _validate_running_method(self):
         """ Validate running_method for the migration records. """
@@ -74,19 +317,117 @@ class OdooDataMigration(models.Model):
 
     @api.constrains('model_name')
     def _validate_model_name(self):
-        """ Validate model name, and also fill out the model relation data to ir.model. """
-        ir_model_obj: models.Model = self.env['ir.model']
+        """ Validate model name against the registry. Model relation data to
+        ir.model is filled out by create and write.
+        """
         for record in self:
-            domain = [('model', '=', record.model_name)]
-            relation = ir_model_obj.search(domain, limit=1)
-            if not relation:
+            if record.model_name not in self.env:
                 raise ValidationError(
                     'Model {} is not found.'.format(
-                        self.model_name))
+                        record.model_name))
 
-            record.write({
-                'model_name_relation': relation.id
-            })
+    @api.constrains('dependency_ids')
+    def _validate_dependency(self):
+        """ Validate migration dependencies don't form a cycle. """
+        if not self._check_m2m_recursion('dependency_ids'):
+            raise ValidationError(
+                'Migration dependencies can not be circular.')
+
+    @api.constrains('model_name', 'migration_type', 'migration_function', 'migration_sql',
+                    'source_file_path')
+    def _validate_migration_type(self):
+        """ Validate migration function or sql is set according to migration type,
+        and migration function is callable in source model.
+        """
+        for record in self:
+            if record.migration_type == eMigrationType.sql.name:
+                if not record.migration_sql:
+                    raise ValidationError(
+                        'SQL migration needs to specify migration SQL.')
+            elif record.migration_type == eMigrationType.file.name:
+                if not record.source_file_path:
+                    raise ValidationError(
+                        'File import needs to specify source file.')
+                if not record.migration_sql and not record.migration_function:
+                    raise ValidationError(
+                        'File import needs to specify migration SQL or migration function.')
+            elif not record.migration_function:
+                raise ValidationError(
+                    'Function migration needs to specify migration function.')
+            if record.migration_type != eMigrationType.sql.name and \
+                    record.migration_function and \
+                    record.model_name in self.env and not callable(
+                    getattr(self.env[record.model_name], record.migration_function, None)):
+                raise ValidationError(
+                    'Migration function {} is not found in model {}.'.format(
+                        record.migration_function, record.model_name))
+
+    @api.constrains('migration_type', 'execution_mode', 'index_ids')
+    def _validate_index_ids(self):
+        """ Validate managed indexes belong to batched migration, single call
+        migration payload is not committed before they are restored.
+        """
+        for record in self:
+            if record.index_ids and not record._is_batched_migration():
+                raise ValidationError(
+                    'Managed indexes need chunked or partitioned execution mode.')
+
+    @api.constrains('migration_type', 'execution_mode', 'target_domain',
+                    'batch_size', 'partition_count', 'prefetch_fields')
+    def _validate_execution_mode(self):
+        """ Validate batched execution settings. """
+        for record in self:
+            if not record._is_batched_migration():
+                continue
+            if record.batch_size <= 0:
+                raise ValidationError(
+                    'Batch size must be greater than zero.')
+            if record.execution_mode == eExecutionMode.partitioned.name:
+                if record.partition_count <= 0:
+                    raise ValidationError(
+                        'Partition count must be greater than zero.')
+                if record.partition_count > self._get_partition_worker_count():
+                    raise ValidationError(
+                        'Partition count can not be greater than {} partition workers.'.format(
+                            self._get_partition_worker_count()))
+            try:
+                domain = safe_eval(record.target_domain or '[]')
+            except Exception:
+                raise ValidationError(
+                    'Target domain {} is not valid.'.format(
+                        record.target_domain))
+            if not isinstance(domain, list):
+                raise ValidationError(
+                    'Target domain {} is not a list.'.format(
+                        record.target_domain))
+            if record.model_name in self.env:
+                unknown_fields = [
+                    fname for fname in record._get_prefetch_fields()
+                    if fname not in self.env[record.model_name]._fields]
+                if unknown_fields:
+                    raise ValidationError(
+                        'Prefetched fields {} are not found in model {}.'.format(
+                            ', '.join(unknown_fields), record.model_name))
+
+    @api.constrains('incremental', 'watermark_field', 'model_name',
+                    'migration_type', 'execution_mode')
+    def _validate_incremental(self):
+        """ Validate incremental migration settings. """
+        for record in self:
+            if not record.incremental:
+                continue
+            if record.migration_type != eMigrationType.function.name or \
+                    record.execution_mode == eExecutionMode.single.name:
+                raise ValidationError(
+                    'Incremental migration needs chunked or partitioned execution mode.')
+            if record.model_name not in self.env:
+                continue
+            field = self.env[record.model_name]._fields.get(record.watermark_field or '')
+            if not field or not field.store or \
+                    field.type not in ('integer', 'float', 'monetary', 'date', 'datetime'):
+                raise ValidationError(
+                    'Watermark field {} is not a stored number or date field of model {}.'.format(
+                        record.watermark_field, record.model_name))
 
     @api.onchange('model_name_relation')
     def _auto_fill_model_name(self):
@@ -102,8 +443,8 @@ class OdooDataMigration(models.Model):
     # Main Migration Function
     ####################################
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         # In case if we add the record from xml data, we need to parse
         # the datetime field since every datetime that will be saved in
         # db should be in UTC.
@@ -114,48 +455,33 @@ class OdooDataMigration(models.Model):
 
         # First, convert the datetime from payload
         if not self.env.context.get('tz', False):
-            convert_datetime_data(vals)
-        result = super().create(vals)
-
-        # Add migration date data
-        result.write({
-            'migration_created_date': datetime.now()
-        })
+            convert_datetime_data(vals_list)
 
-        # Look for record that is using cron as the running method,
-        # then create ir_cron record data so it will be executed
-        # through odoo cron job.
-        cron_result: OdooDataMigration = result.filtered_domain([
-            '&',
-            ('running_method', '=', eRunningMethod.cron_job.name),
-            ('scheduled_running_time', '!=', False)
-        ])
-        for migration in cron_result:
-            # Create cron job record
-            ir_cron_record = migration._create_cron_data()
-            # Add cron job record reference
-            migration.write({
-                'ir_cron_reference': ir_cron_record
-            })
+        # Add migration date data, in the same insert as the migration records
+        now = datetime.now()
+        vals_list = [dict(self._fill_model_name_relation(vals),
+                          migration_created_date=vals.get('migration_created_date') or now)
+                     for vals in vals_list]
 
-        return result
+        # Migration that using cron as the running method doesn't need any
+        # additional record, it will be picked up by the dispatcher cron
+        # once scheduled_running_time has passed.
+        return super().create(vals_list)
 
     def write(self, vals_list):
-        # In case when changing migration from at_upgrade to using cron_job,
-        # auto add new ir_cron record.
-        result = super().write(vals_list)
-        cron_migration: OdooDataMigration = self.filtered_domain([
-            '&',
-            '&',
-            ('running_method', '=', eRunningMethod.cron_job.name),
-            ('scheduled_running_time', '!=', False),
-            ('ir_cron_reference', '=', False)
-        ])
-        for record in cron_migration:
-            cron_record = record._create_cron_data()
-            record.ir_cron_reference = cron_record
+        # Checkpoint is only meaningful for the target it was recorded on,
+        # so changing the target drops it.
+        if 'checkpoint_id' not in vals_list and any(
+                key in vals_list for key in self._get_checkpoint_reset_fields()):
+            vals_list = dict(vals_list, checkpoint_id=0)
+            self.mapped('partition_ids').unlink()
+        vals_list = self._fill_model_name_relation(vals_list)
+        # Watermark is only meaningful for the target it was recorded on
+        if 'watermark_value' not in vals_list and any(
+                key in vals_list for key in ['model_name', 'watermark_field', 'target_domain']):
+            vals_list = dict(vals_list, watermark_value=False)
 
-        return result
+        return super().write(vals_list)
 
     @api.model
     def trigger_migration_upgrade(self):
@@ -170,159 +496,1364 @@ class OdooDataMigration(models.Model):
             ('running_method', '=', eRunningMethod.at_upgrade.name),
             ('migration_status', '=', eMigrationStatus.queued.name)
         ])
+        # Also rerun migrations left running by a crashed upgrade
+        auto_upgrade_data |= self.search([
+            '&',
+            ('running_method', '=', eRunningMethod.at_upgrade.name),
+            ('migration_status', '=', eMigrationStatus.running.name)
+        ])._filter_stale_running()
 
         migration_count = len(auto_upgrade_data)
-        failed_migration_count = 0
         _logger.info(
             '\nRunning auto migration for {} migration.'.format(migration_count))
+        auto_upgrade_data._check_upgrade_window()
 
-        for index, migration in enumerate(auto_upgrade_data):
-            _logger.info(
-                '\nRUNNING MIGRATION #{} \nMIGRATION : {} \nDESCRIPTION : {}'.format(
-                    index + 1, migration.name, migration.description))
-            migration.run_migration()
-            if migration.migration_status == eMigrationStatus.failed.name:
-                failed_migration_count += 1
+        failed_migration_count, skipped_migration_count = \
+            auto_upgrade_data._run_scheduled_migration(self._get_worker_count())
 
         _logger.info(
-            '\nMigration done running\nTOTAL: {}\nSUCCESS: {}\nFAILED: {}'.format(
+            '\nMigration done running\nTOTAL: {}\nSUCCESS: {}\nFAILED: {}\nSKIPPED: {}'.format(
                 migration_count,
                 migration_count -
+                failed_migration_count -
+                skipped_migration_count,
                 failed_migration_count,
-                failed_migration_count))
+                skipped_migration_count))
 
         return True
 
+    @api.model
+    def _cron_dispatch_migration(self, limit=None):
+        """
+        Main trigger function of the dispatcher cron. Claim queued migrations
+        using running_method cron_job whose scheduled running time has passed,
+        then run them. Claimed rows are locked with SKIP LOCKED, so concurrent
+        cron workers never pick the same migration. At most limit migrations,
+        default to `data_migration_dispatch_limit` option in config file, are
+        run on each call. Migrations left running by a crashed worker for longer
+        than the lease timeout are claimed again.
+        """
+        limit = limit or get_int_option('data_migration_dispatch_limit', 10)
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            UPDATE odoo_data_migration
+            SET migration_status = %(running)s, last_run = %(now)s
+            WHERE id IN (
+                SELECT id FROM odoo_data_migration
+                WHERE running_method = %(cron_job)s
+                    AND scheduled_running_time <= %(now)s
+                    AND (migration_status = %(queued)s OR (
+                        migration_status = %(running)s
+                        AND last_run < %(stale_time)s
+                        AND NOT {}))
+                ORDER BY scheduled_running_time, id
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+        """.format(lock_held_condition('odoo_data_migration.id')), {
+            'running': eMigrationStatus.running.name,
+            'queued': eMigrationStatus.queued.name,
+            'cron_job': eRunningMethod.cron_job.name,
+            'now': now,
+            'stale_time': now - timedelta(seconds=self._get_lease_timeout()),
+            'limit': limit
+        })
+        claimed_ids = [row[0] for row in self.env.cr.fetchall()]
+        # Commit the claim, so other cron workers skip these migrations
+        self.env.cr.commit()
+        if not claimed_ids:
+            return True
+
+        # Keep the scheduled order, the UPDATE doesn't return rows in order
+        due_data: OdooDataMigration = self.search(
+            [('id', 'in', claimed_ids)], order='scheduled_running_time, id')
+        _logger.info(
+            '\nDispatching {} scheduled migration.'.format(len(due_data)))
+        due_data._run_scheduled_migration(self._get_worker_count())
+        return True
+
     def batch_migration(self):
         """
         Function to run migration as batch. Used for contextual action button
-        in list view.
+        in list view. Migrations are enqueued instead when the job queue is
+        enabled.
         """
-        for record in self:
-            record.run_migration()
-            # Deactivate cron record so migration won't run twice
-            record._deactivate_cron()
+        if self._is_job_queue_enabled():
+            self.enqueue_migration()
+            return
+        self._run_scheduled_migration(self._get_worker_count())
+
+    def action_run_migration(self):
+        """ Run migration from the form view, or enqueue it when the job queue
+        is enabled, so long migration doesn't block the HTTP worker.
+        """
+        self.ensure_one()
+        if self._is_job_queue_enabled():
+            self.enqueue_migration()
+        else:
+            self.run_migration()
+        return True
+
+    def enqueue_migration(self):
+        """ Put migration records on the job queue. They are run by the migration
+        job runner, started with `odoo-bin datamigrationworker`, following their
+        dependencies. Return the created job records.
+        """
+        return self.env['odoo.data.migration.job']._enqueue(self)
+
+    def _run_scheduled_migration(self, worker_count):
+        """ Run migrations following their dependency graph. Migrations are
+        grouped into layers, and a layer only runs once the migrations it depends
+        on are done. Migrations of a layer run concurrently when worker_count is
+        greater than 1. Migrations depending on a migration that is not done are
+        skipped and kept in queue. Return tuple of failed and skipped migration
+        count.
+        """
+        graph = {record.id: record.dependency_ids.ids for record in self}
+        try:
+            layers = topological_layers(graph)
+        except ValueError as e:
+            raise UserError(
+                'Migration dependencies are circular for migration id {}.'.format(
+                    e.args[0]))
+
+        # Migration records need to be committed before they are visible to
+        # the status cursor
+        self.env.cr.commit()
+
+        failed_migration_count = 0
+        skipped_migration_count = 0
+        migration_index = 0
+        for layer in layers:
+            layer_data: OdooDataMigration = self.browse(layer)
+            # Statuses may be updated by workers of previous layer
+            layer_data.mapped('dependency_ids').invalidate_cache()
+
+            ready_data = layer_data.filtered(
+                lambda migration: all(
+                    dependency.migration_status == eMigrationStatus.done.name
+                    for dependency in migration.dependency_ids))
+            for migration in layer_data - ready_data:
+                skipped_migration_count += 1
+                migration._mark_skipped()
+
+            if worker_count > 1 and len(ready_data) > 1:
+                failed_migration_count += ready_data._run_parallel_migration(
+                    worker_count)
+                migration_index += len(ready_data)
+                continue
+
+            if ready_data:
+                failed_migration_count += ready_data._run_sequential_migration(
+                    migration_index)
+                migration_index += len(ready_data)
+
+        return failed_migration_count, skipped_migration_count
+
+    def _run_sequential_migration(self, migration_index=0):
+        """ Run migrations one after another on the current cursor. Migrations
+        are claimed and marked running together, and their payloads are
+        committed together before their status is written, so a batch of small
+        migrations only commits a few times. A group is committed once it holds
+        `data_migration_commit_group_size` migrations or has run for
+        `data_migration_commit_group_time` seconds, so its locks are not held
+        for the whole batch. Migrations already run elsewhere are left out.
+        Return number of failed migrations.
+        """
+        with self._lock_migration() as claimed_data:
+            for migration in self - claimed_data:
+                _logger.warning(
+                    '\nMIGRATION : {} \nAlready running, skipped.'.format(migration.name))
+            if not claimed_data:
+                return 0
+            with self._status_env() as status_env:
+                claimed_data.with_env(status_env).mark_running()
+
+            max_group_size = get_int_option('data_migration_commit_group_size', 20)
+            max_group_time = get_float_option('data_migration_commit_group_time', 60.0)
+            results = []
+            pending_results = []
+            group_start_time = time.perf_counter()
+            for migration in claimed_data:
+                migration_index += 1
+                _logger.info(
+                    '\nRUNNING MIGRATION #{} \nMIGRATION : {} \nDESCRIPTION : {}'.format(
+                        migration_index, migration.name, migration.description))
+                # Batched migration commits its own batches, finish the previous
+                # migrations first so their payload is never committed without
+                # their status. Migration estimated longer than the group time
+                # would hold their locks for its whole run.
+                if pending_results and (
+                        migration._is_batched_migration() or
+                        migration.estimated_duration > max_group_time):
+                    self._commit_migration_results(pending_results)
+                    pending_results = []
+                if not pending_results:
+                    group_start_time = time.perf_counter()
+                dummy, result = migration._execute_migration()
+                results.append(result)
+                pending_results.append(result)
+                if len(pending_results) >= max_group_size or \
+                        time.perf_counter() - group_start_time >= max_group_time:
+                    self._commit_migration_results(pending_results)
+                    pending_results = []
+            self._commit_migration_results(pending_results)
+
+        return len([
+            error_traceback for dummy, error_traceback, dummy, dummy in results
+            if error_traceback])
+
+    def parallel_migration(self, worker_count=None):
+        """ Run migrations concurrently using a pool of worker threads. Each
+        worker runs a migration with its own cursor. Worker count default to
+        `data_migration_workers` option in config file.
+        """
+        self._run_parallel_migration(worker_count or self._get_worker_count())
+        return True
+
+    def _run_parallel_migration(self, worker_count):
+        """ Spread migrations across worker_count worker threads, then log the
+        wall clock time against the sequential time. Return number of failed
+        migrations.
+        """
+        # Workers use their own cursor, so the migration records need to be
+        # committed before they are visible to the workers.
+        self.env.cr.commit()
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(worker_count, 1)) as executor:
+            results = list(executor.map(self._run_migration_in_worker, self.ids))
+        wall_clock_time = time.perf_counter() - start_time
+
+        # Status were written by the workers, drop stale values
+        self.invalidate_cache()
+
+        sequential_time = sum(duration for dummy, duration in results)
+        failed_migration_count = len([
+            is_failed for is_failed, dummy in results if is_failed])
+        _logger.info(
+            '\nParallel migration done running\nWORKERS: {}\nWALL CLOCK: {:.2f}s'
+            '\nSEQUENTIAL: {:.2f}s\nSAVED: {:.2f}s'.format(
+                worker_count, wall_clock_time, sequential_time,
+                sequential_time - wall_clock_time))
+        return failed_migration_count
+
+    def _run_migration_in_worker(self, migration_id):
+        """ Run a single migration in a new cursor. Used as worker target by
+        _run_parallel_migration. Return tuple of failed flag and duration.
+        """
+        start_time = time.perf_counter()
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            migration = env[self._name].browse(migration_id)
+            _logger.info(
+                '\nRUNNING MIGRATION IN WORKER \nMIGRATION : {} \nDESCRIPTION : {}'.format(
+                    migration.name, migration.description))
+            try:
+                migration.run_migration()
+            except UserError as e:
+                # Migration is claimed by another worker, cron or node
+                _logger.warning('\nMIGRATION : {} \n{}'.format(migration.name, e.args[0]))
+            is_failed = migration.migration_status == eMigrationStatus.failed.name
+        return is_failed, time.perf_counter() - start_time
 
     def run_migration(self):
         """ Main migration running function. """
 
         self.ensure_one()
-        # Mark migration as running
-        self.mark_running()
+        # Migration record needs to be committed before it is visible to the
+        # status cursor
+        self.env.cr.commit()
+        with self._lock_migration() as claimed_data:
+            if not claimed_data:
+                raise UserError(
+                    'Migration {} is already running.'.format(self.name))
+            with self._status_env() as status_env:
+                self.with_env(status_env).mark_running()
 
+            migrate, result = self._execute_migration()
+            self._commit_migration_results([result])
+        return migrate
+
+    def _execute_migration(self):
+        """ Run the migration payload on the current cursor, without writing its
+        status. Single call migration runs inside a savepoint, so a failure only
+        rolls back this migration. Batched migration commits every batch, and a
+        failure only rolls back the failed batch. Return tuple of migration
+        result and result data written by _commit_migration_results.
+        """
+        self.ensure_one()
+        is_batched = self._is_batched_migration()
         is_exception_raised = False
+        traceback_message = False
         migrate = False
+        start_time = datetime.now()
+        # Records changed during the run are past the watermark taken before it,
+        # so they are processed again by the next run instead of being missed
+        watermark_value = self._get_watermark_value() if self.incremental else False
+        if self._is_write_date_watermark():
+            self.env['odoo.data.migration.batch']._clean_batches(
+                self.id, self.watermark_value)
         _logger.info('\\STARTING MIGRATION : {} \nDESCRIPTION : {}'.format(
             self.name, self.description))
 
         # Try to run migration
-        try:
-            migrate = api.call_kw(self.env[self.model_name],
-                                  self.migration_function, args=[[]], kwargs={})
-        except Exception as e:
-            is_exception_raised = True
-            traceback_message = traceback.format_exc()
-            # If failed, mark failed and log the traceback message
-            self.mark_failed(traceback_message)
-
-        # Check if exception raised
-        if not is_exception_raised:
-            self.mark_success()
+        with MigrationMetrics(self.env.cr, self._get_bookkeeping_tables()) as metrics, \
+                self._profile_run() as profiler:
+            try:
+                if is_batched:
+                    self._set_timeouts()
+                    # Batches are committed, start from a new transaction. Timeouts
+                    # are committed too, so a rolled back batch doesn't reset them
+                    self.env.cr.commit()
+                    self.index_ids._drop(self._get_timeouts()[0])
+                if self.migration_type == eMigrationType.sql.name:
+                    migrate = self._run_sql_migration()
+                elif self.migration_type == eMigrationType.file.name:
+                    migrate = self._run_file_migration()
+                elif self.execution_mode == eExecutionMode.chunked.name:
+                    migrate = self._run_chunked_migration()
+                elif self.execution_mode == eExecutionMode.partitioned.name:
+                    migrate = self._run_partitioned_migration(metrics)
+                else:
+                    # Payload is committed along with the following migrations,
+                    # so it can't commit or roll back by itself. Savepoint of
+                    # Odoo 13 doesn't flush, pending writes are flushed so they
+                    # belong to the right migration.
+                    self.env['base'].flush()
+                    with self.env.cr.savepoint(), prevent_commit(
+                            self.env.cr, 'Single call migration can not commit or roll back, '
+                            'use chunked execution mode instead.'):
+                        self._set_timeouts()
+                        migrate = api.call_kw(
+                            self.env[self.model_name].with_context(
+                                **self._get_migration_context()),
+                            self.migration_function, args=[[]], kwargs={})
+                        self.env['base'].flush()
+            except Exception as e:
+                is_exception_raised = True
+                traceback_message = traceback.format_exc()
+                if not is_batched:
+                    # Drop pending writes and cache of the rolled back savepoint
+                    self.env.clear()
+                if is_batched:
+                    # Drop the failed batch, committed batches are kept by checkpoint
+                    self.env.cr.rollback()
+            self._reset_timeouts()
+
+            if is_batched:
+                restore_traceback = self._restore_table_objects()
+                if restore_traceback:
+                    is_exception_raised = True
+                    traceback_message = '\n'.join(filter(None, [
+                        traceback_message, restore_traceback]))
+
+        vals, run_vals = self._get_run_statistics(
+            migrate if not is_exception_raised and is_batched else 0,
+            metrics, self._get_retry_count() if is_batched else 0)
+        run_vals['start_time'] = start_time
+        if profiler:
+            run_vals.update(self._get_profile_vals(profiler))
+        if not is_exception_raised and self.incremental:
+            vals['watermark_value'] = watermark_value
 
         _logger.info('\nMIGRATION RESULT : {}'.format(
             'FAILED' if is_exception_raised else 'SUCCESS'))
 
-        return migrate
+        return migrate, (self.id, traceback_message, vals, run_vals)
 
-    ####################################
-    # Utils
-    ####################################
+    def _restore_table_objects(self):
+        """ Restore managed indexes, constraints and triggers, then analyze their
+        tables and the source model table if analyze_after_run is set. Return
+        the traceback of the failure, or False.
+        """
+        self.ensure_one()
+        index_data = self.index_ids
+        analyze_table_names = [self.env[self.model_name]._table] \
+            if self.analyze_after_run else []
+        if not index_data and not analyze_table_names:
+            return False
+        # Concurrent rebuild on another cursor waits for every open transaction,
+        # this cursor must not start a new one until it is done
+        self.env.cr.commit()
+        try:
+            index_data._restore(analyze_table_names)
+        except Exception:
+            return traceback.format_exc()
+        return False
 
-    def _create_cron_data(self):
-        self.ensure_one()
-        payload = {
-            'name': 'Scheduled Migration - ' + self.name,
-            'model_id': self.env.ref('odoo_data_migration.model_odoo_data_migration').id,
-            # 'user_id': self.env.ref('base.user_root').id,
-            'state': 'code',
-            'code': "rec = env['odoo.data.migration'].browse({}).run_migration()".format(self.id),
-            'interval_number': 0,
-            'active': True,
-            'numbercall': 1,
-            'nextcall': self.scheduled_running_time
-        }
-        ir_cron_data = self.env['ir.cron'].create(payload)
-        return ir_cron_data
+    def restore_indexes(self):
+        """ Restore managed indexes, constraints and triggers left dropped by an
+        interrupted run.
+        """
+        if any(record.migration_status == eMigrationStatus.running.name
+               for record in self):
+            raise UserError(
+                'Indexes of running migration are restored at the end of the run.')
+        index_data = self.mapped('index_ids').filtered('is_dropped')
+        # Concurrent rebuild on another cursor waits for every open transaction,
+        # this cursor must not start a new one until it is done
+        self.env.cr.commit()
+        index_data._restore()
+        return True
 
-    def mark_running(self):
-        """ Mark migration records as running. """
+    def _commit_migration_results(self, results):
+        """ Commit migration payloads, then write status, statistics and run
+        history of the finished migrations in a single status transaction, so a
+        migration is never marked done before its payload is committed. results
+        is a list of result data returned by _execute_migration.
+        """
+        self.env.cr.commit()
+        if not results:
+            return
+        with self._status_env() as status_env:
+            migration_obj = status_env[self._name]
+            for migration_id, error_traceback, vals, run_vals in results:
+                migration = migration_obj.browse(migration_id)
+                # Check if exception raised
+                if error_traceback:
+                    # If failed, mark failed and log the traceback message
+                    migration.mark_failed(error_traceback, vals, run_vals)
+                else:
+                    migration.mark_success(vals, run_vals)
+
+    def _run_chunked_migration(self):
+        """ Run the migration function on the target domain one batch at a time.
+        Records are fetched by ascending id and every batch is committed together
+        with the checkpoint once the migration function returns, so a rerun
+        continues after the last committed batch. Return the number of processed
+        records.
+        """
+        self.ensure_one()
+        domain = self._get_target_domain()
+        self._update_progress(total_count=self.env[self.model_name].search_count(
+            domain + [('id', '>', self.checkpoint_id)]))
+        return self._process_chunks(domain, self)
+
+    def _process_chunks(self, domain, checkpoint_record):
+        """ Call the migration function for every batch of records matching
+        domain, starting after the checkpoint_id of checkpoint_record. The
+        checkpoint is written on checkpoint_record and committed after every
+        batch. Return the number of processed records.
+        """
+        self.ensure_one()
+        processed_count = 0
+        last_id = checkpoint_record.checkpoint_id
+        if last_id:
+            _logger.info('\nMIGRATION : {} \nRESUMING AFTER ID : {}'.format(
+                self.name, last_id))
+        start_time = time.perf_counter()
+
+        throttle = self._get_throttle()
+        retry = self._get_retry()
+        for chunk in self.stream_records(
+                self.model_name, domain, self.batch_size,
+                self._get_prefetch_fields(), last_id):
+            # Progress counts skipped records too, so it still reaches the total
+            progress_count = len(chunk)
+            chunk = self._filter_written_records(chunk)
+            if chunk:
+                retry.run(self._migrate_chunk, chunk, checkpoint_record)
+            processed_count += len(chunk)
+
+            elapsed = time.perf_counter() - start_time
+            _logger.info(
+                '\nMIGRATION : {} \nPROCESSED : {} records ({:.2f} records/s)'.format(
+                    self.name, processed_count,
+                    processed_count / elapsed if elapsed else 0.0))
+            self._update_progress(processed_increment=progress_count)
+            if chunk:
+                throttle.wait(len(chunk))
+
+        if throttle.throttled_time:
+            _logger.info('\nMIGRATION : {} \nTHROTTLED : {:.2f}s'.format(
+                self.name, throttle.throttled_time))
+        return processed_count
+
+    def _migrate_chunk(self, chunk, checkpoint_record):
+        """ Call the migration function on chunk, then commit it along with the
+        checkpoint written on checkpoint_record, so each chunk is an independent
+        unit of work.
+        """
+        self.ensure_one()
+        api.call_kw(chunk.browse().with_context(**self._get_migration_context()),
+                    self.migration_function, args=[chunk.ids], kwargs={})
+        self._flush_batch()
+        checkpoint_record.write({
+            'checkpoint_id': chunk.ids[-1]
+        })
+        if self._is_write_date_watermark():
+            self.env['odoo.data.migration.batch']._add_batch(self.id)
+        self.env.cr.commit()
+
+    def _filter_written_records(self, records):
+        """ Return records without the ones written by a previous batch of the
+        migration and not changed since, for write_date watermark. Their
+        write_date is past the watermark taken before the run that wrote them.
+        """
+        self.ensure_one()
+        if not self.watermark_value or not self._is_write_date_watermark():
+            return records
+        return records - records.browse(
+            self.env['odoo.data.migration.batch']._get_written_ids(self.id, records))
+
+    @api.model
+    def stream_records(self, model_name, domain=None, batch_size=1000, fnames=None,
+                       last_id=0):
+        """ Yield recordsets of at most batch_size records of model_name matching
+        domain, by ascending id after last_id. When fnames is given, only these
+        fields are read for each recordset. Pending writes are flushed and the
+        ORM cache is cleared before the next recordset is fetched, so memory
+        stays bounded whatever the number of records. Can also be used inside a
+        migration function to walk a large model.
+        """
+        target_model = self.env[model_name]
+        if fnames:
+            target_model = target_model.with_context(prefetch_fields=False)
+
+        while True:
+            records = target_model.search(
+                (domain or []) + [('id', '>', last_id)], order='id', limit=batch_size)
+            if not records:
+                return
+            if fnames:
+                records.read(fnames)
+            last_id = records.ids[-1]
+            yield records
+
+            # Evict records of the previous batch from the cache
+            target_model.flush()
+            target_model.invalidate_cache()
+
+    def _run_sql_migration(self):
+        """ Run migration SQL for every batch of batch_size ids of the source
+        model table, starting after the checkpoint. Every batch is committed
+        together with the checkpoint. Source model fields are invalidated in the
+        ORM cache afterwards. Return the number of rows affected.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        # Pending ORM writes need to be in database before the SQL runs
+        target_model.flush()
+
+        affected_count = 0
+        retry = self._get_retry()
+        if '%(min_id)s' not in self.migration_sql:
+            affected_count = retry.run(self._execute_migration_sql)
+        else:
+            self.env.cr.execute(
+                'SELECT min(id), max(id) FROM "{}"'.format(target_model._table))
+            min_id, max_id = self.env.cr.fetchone()
+            max_id = max_id or 0
+            last_id = self.checkpoint_id
+            if last_id:
+                _logger.info('\nMIGRATION : {} \nRESUMING AFTER ID : {}'.format(
+                    self.name, last_id))
+            elif min_id:
+                # Skip the empty ranges below the first id, like the dry run
+                last_id = min_id - 1
+            # Progress of SQL migration is counted in ids
+            self._update_progress(total_count=max(max_id - last_id, 0))
+            start_time = time.perf_counter()
+            throttle = self._get_throttle()
+
+            while last_id < max_id:
+                batch_first_id = last_id + 1
+                batch_max_id = min(last_id + self.batch_size, max_id)
+                batch_affected_count = retry.run(
+                    self._execute_migration_sql, batch_first_id, batch_max_id)
+                affected_count += batch_affected_count
+                last_id = batch_max_id
+
+                elapsed = time.perf_counter() - start_time
+                _logger.info(
+                    '\nMIGRATION : {} \nPROCESSED : up to id {} of {}, {} rows ({:.2f} rows/s)'.format(
+                        self.name, last_id, max_id, affected_count,
+                        affected_count / elapsed if elapsed else 0.0))
+                self._update_progress(processed_increment=batch_max_id - batch_first_id + 1)
+                throttle.wait(batch_affected_count)
+
+        if self.sql_invalidate_cache:
+            target_model.invalidate_cache(fnames=self._get_invalidate_fields() or None)
+        return affected_count
+
+    def _execute_migration_sql(self, min_id=None, max_id=None):
+        """ Run migration SQL once, or on the batch of ids from min_id to max_id
+        then commit it along with the checkpoint. Return the number of rows
+        affected.
+        """
+        self.ensure_one()
+        if min_id is None:
+            self.env.cr.execute(self.migration_sql)
+            return max(self.env.cr.rowcount, 0)
+
+        self.env.cr.execute(self.migration_sql, {
+            'min_id': min_id,
+            'max_id': max_id
+        })
+        affected_count = max(self.env.cr.rowcount, 0)
         self.write({
-            'migration_status': eMigrationStatus.running.name,
-            'last_run': datetime.now()
+            'checkpoint_id': max_id
         })
-        # Commit to avoid running error when using cron
         self.env.cr.commit()
+        return affected_count
+
+    def _run_file_migration(self):
+        """ Stream the source file in batches of batch_size records. Every batch
+        is loaded into the staging table with COPY, then merged into the target
+        with migration SQL, or passed to the migration function as a list of rows.
+        Every batch is committed together with the checkpoint, the number of
+        imported records. Return the number of imported records.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        columns = self._create_staging_table()
+        # Keep the staging table when a batch is rolled back
+        self.env.cr.commit()
+        resume_count = processed_count = self.checkpoint_id
+        if resume_count:
+            _logger.info('\nMIGRATION : {} \nRESUMING AFTER RECORD : {}'.format(
+                self.name, resume_count))
+        self._update_progress(total_count=max(count_records(
+            self.source_file_path, self.source_file_format) - resume_count, 0))
+        start_time = time.perf_counter()
+
+        throttle = self._get_throttle()
+        retry = self._get_retry()
+        for buffer, record_count in iter_copy_batches(
+                self.source_file_path, self.source_file_format,
+                self.batch_size, processed_count):
+            processed_count += record_count
+            retry.run(self._import_file_batch, columns, buffer, processed_count)
+            # Evict imported records from the cache
+            target_model.invalidate_cache()
+
+            elapsed = time.perf_counter() - start_time
+            _logger.info(
+                '\nMIGRATION : {} \nIMPORTED : {} records ({:.2f} records/s)'.format(
+                    self.name, processed_count,
+                    (processed_count - resume_count) / elapsed if elapsed else 0.0))
+            self._update_progress(processed_increment=record_count)
+            throttle.wait(record_count)
 
-    def mark_success(self):
-        """ Mark migration records as success. """
+        self.env.cr.execute('DROP TABLE IF EXISTS {}'.format(STAGING_TABLE))
+        return processed_count
+
+    def _import_file_batch(self, columns, buffer, processed_count):
+        """ Import a batch of the source file, then commit it along with the
+        checkpoint. Staging rows are deleted on commit.
+        """
+        self.ensure_one()
+        buffer.seek(0)
+        self._import_staging_batch(columns, buffer)
         self.write({
-            'migration_status': eMigrationStatus.done.name,
-            'error_traceback': ''
+            'checkpoint_id': processed_count
         })
-        # Commit to avoid running error when using cron
         self.env.cr.commit()
 
-    def mark_failed(self, error_traceback):
-        """ Mark migration records as failed, also log the error traceback. """
+    def _create_staging_table(self):
+        """ Create temporary staging table for the columns of the source file,
+        emptied on every commit. Return the list of columns.
+        """
+        self.ensure_one()
+        try:
+            columns = read_columns(self.source_file_path, self.source_file_format)
+        except (IOError, OSError) as e:
+            raise UserError('Source file {} can not be read: {}'.format(
+                self.source_file_path, e))
+        if not columns or any(not column or '"' in column for column in columns):
+            raise UserError('Source file {} has invalid columns {}.'.format(
+                self.source_file_path, columns))
+
+        column_type = 'text' if self.source_file_format == eFileFormat.csv.name else 'jsonb'
+        self.env.cr.execute('DROP TABLE IF EXISTS {}'.format(STAGING_TABLE))
+        self.env.cr.execute(
+            'CREATE TEMPORARY TABLE {} ({}) ON COMMIT DELETE ROWS'.format(
+                STAGING_TABLE, ', '.join(
+                    '"{}" {}'.format(column, column_type) for column in columns)))
+        return columns
+
+    def _import_staging_batch(self, columns, buffer):
+        """ Load a batch of the source file into the staging table, then merge it
+        into the target with migration SQL, or call the migration function with
+        the list of loaded rows, dict for CSV file and JSON value for JSON Lines.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        self.env.cr.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                STAGING_TABLE, ', '.join('"{}"'.format(column) for column in columns)),
+            buffer)
+        if self.migration_sql:
+            # Pending ORM writes need to be in database before the SQL runs
+            target_model.flush()
+            self.env.cr.execute(self.migration_sql)
+            if self.sql_invalidate_cache:
+                target_model.invalidate_cache(fnames=self._get_invalidate_fields() or None)
+        if self.migration_function:
+            self.env.cr.execute('SELECT * FROM {}'.format(STAGING_TABLE))
+            rows = self.env.cr.dictfetchall()
+            if self.source_file_format != eFileFormat.csv.name:
+                rows = [row['data'] for row in rows]
+            getattr(target_model.with_context(**self._get_migration_context()),
+                    self.migration_function)(rows)
+            self._flush_batch()
+
+    def _run_partitioned_migration(self, metrics=None):
+        """ Run every unfinished partition of the migration in its own worker,
+        then combine the partition results. Partitions that are already done are
+        kept, so a rerun only process the remaining ones. Metrics of the workers
+        are added to metrics. Return the number of processed records, raise
+        UserError with every partition traceback if any partition failed.
+        """
+        self.ensure_one()
+        partitions = self.partition_ids.filtered(
+            lambda partition: partition.migration_status != eMigrationStatus.done.name)
+        if not partitions:
+            self.partition_ids.unlink()
+            partitions = self._create_partitions()
+
+        target_model = self.env[self.model_name]
+        domain = self._get_target_domain()
+        self._update_progress(total_count=sum(
+            target_model.search_count(domain + [
+                ('id', '>', max(partition.checkpoint_id, partition.min_id - 1)),
+                ('id', '<=', partition.max_id)
+            ]) for partition in partitions))
+
+        # Workers use their own cursor, so the partitions need to be committed
+        # before they are visible to the workers.
+        self.env.cr.commit()
+
+        # Every worker holds a cursor, and opens progress and throttle cursors
+        with ThreadPoolExecutor(max_workers=max(min(
+                len(partitions), self._get_partition_worker_count()), 1)) as executor:
+            worker_metrics = list(executor.map(
+                self._run_partition_in_worker, partitions.ids))
+        if metrics:
+            for partition_metrics in worker_metrics:
+                metrics.add(partition_metrics)
+
+        # Partitions were written by the workers, drop stale values
+        partitions.invalidate_cache()
+
+        failed_partitions = partitions.filtered(
+            lambda partition: partition.migration_status == eMigrationStatus.failed.name)
+        if failed_partitions:
+            raise UserError('{} of {} partitions failed.\n\n{}'.format(
+                len(failed_partitions), len(partitions),
+                '\n'.join('PARTITION {} - {}\n{}'.format(
+                    partition.min_id, partition.max_id, partition.error_traceback)
+                    for partition in failed_partitions)))
+
+        return sum(partitions.mapped('processed_record_count'))
+
+    def _create_partitions(self):
+        """ Split id range of the target records into partition_count ranges of
+        equal width. Return the created partition records.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        domain = self._get_target_domain()
+        partition_obj = self.env['odoo.data.migration.partition']
+        first_record = target_model.search(domain, order='id', limit=1)
+        last_record = target_model.search(domain, order='id desc', limit=1)
+        if not first_record:
+            return partition_obj
+
+        range_size = max(math.ceil(
+            (last_record.id - first_record.id + 1) / self.partition_count), 1)
+        return partition_obj.create([{
+            'migration_id': self.id,
+            'min_id': min_id,
+            'max_id': min(min_id + range_size - 1, last_record.id)
+        } for min_id in range(first_record.id, last_record.id + 1, range_size)])
+
+    def _run_partition_in_worker(self, partition_id):
+        """ Run a single partition in a new cursor. Used as worker target by
+        _run_partitioned_migration. Return the metrics of the worker.
+        """
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            with MigrationMetrics(cr, self._get_bookkeeping_tables()) as metrics:
+                env['odoo.data.migration.partition'].browse(partition_id).run_partition()
+        return metrics
+
+    ####################################
+    # Dry Run
+    ####################################
+
+    def action_dry_run(self):
+        """ Run the migration on a sample of its target inside a savepoint that
+        is rolled back, then extrapolate duration, record count and SQL queries
+        of the whole migration from the sample cost.
+        """
+        self.ensure_one()
+        if self.migration_status == eMigrationStatus.running.name:
+            raise UserError('Migration is currently running.')
+
+        target_model = self.env[self.model_name]
+        sample_count = 0
+        total_count = 0
+        try:
+            with self.env.cr.savepoint(), prevent_commit(self.env.cr), \
+                    MigrationMetrics(self.env.cr) as metrics:
+                sample_count, total_count = self._run_dry_run_sample()
+                # Make pending writes part of the measure
+                target_model.flush()
+                raise DryRunRollback()
+        except DryRunRollback:
+            pass
+        # Rolled back values may still be in the cache
+        target_model.invalidate_cache()
+
+        # Extrapolate from the sample when the migration runs in batches,
+        # otherwise the sample is the whole migration.
+        ratio = total_count / sample_count if sample_count else 1.0
         self.write({
+            'dry_run_date': datetime.now(),
+            'estimated_record_count': total_count,
+            'estimated_duration': metrics.duration * ratio,
+            'estimated_query_count': int(metrics.query_count * ratio)
+        })
+        _logger.info(
+            '\nDRY RUN : {} \nSAMPLE : {} of {} records \nESTIMATED DURATION : {:.2f}s'
+            '\nESTIMATED SQL : {} queries'.format(
+                self.name, sample_count, total_count, self.estimated_duration,
+                self.estimated_query_count))
+        return True
+
+    def _run_dry_run_sample(self):
+        """ Run the migration on dry_run_sample_size records of its target.
+        Return tuple of the sample size and the target size, both 0 when the
+        migration can't be sampled and runs entirely.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        sample_size = max(self.dry_run_sample_size, 1)
+
+        if self.migration_type == eMigrationType.sql.name:
+            if '%(min_id)s' not in self.migration_sql:
+                self.env.cr.execute(self.migration_sql)
+                return 0, 0
+            self.env.cr.execute(
+                'SELECT min(id), max(id) FROM "{}"'.format(target_model._table))
+            min_id, max_id = self.env.cr.fetchone()
+            if not min_id:
+                return 0, 0
+            self.env.cr.execute(self.migration_sql, {
+                'min_id': min_id,
+                'max_id': min_id + sample_size - 1
+            })
+            return min(sample_size, max_id - min_id + 1), max_id - min_id + 1
+
+        if self.migration_type == eMigrationType.file.name:
+            columns = self._create_staging_table()
+            for buffer, record_count in iter_copy_batches(
+                    self.source_file_path, self.source_file_format, sample_size):
+                self._import_staging_batch(columns, buffer)
+                return record_count, count_records(
+                    self.source_file_path, self.source_file_format)
+            return 0, 0
+
+        context_model = target_model.with_context(**self._get_migration_context())
+        if self.execution_mode == eExecutionMode.single.name:
+            api.call_kw(context_model, self.migration_function, args=[[]], kwargs={})
+            return 0, 0
+
+        domain = self._get_target_domain()
+        sample = target_model.search(domain, order='id', limit=sample_size)
+        if sample:
+            api.call_kw(context_model, self.migration_function,
+                        args=[sample.ids], kwargs={})
+            self._flush_batch()
+        return len(sample), target_model.search_count(domain)
+
+    def _check_upgrade_window(self):
+        """ Warn when estimated duration of the migrations goes over the
+        `data_migration_upgrade_window` option of config file, in seconds.
+        """
+        upgrade_window = get_float_option('data_migration_upgrade_window', 0.0)
+        if not upgrade_window:
+            return True
+
+        estimated_duration = sum(self.mapped('estimated_duration'))
+        not_estimated_data = self.filtered(lambda migration: not migration.dry_run_date)
+        if estimated_duration > upgrade_window:
+            _logger.warning(
+                '\nEstimated migration duration {:.0f}s is over the upgrade window {:.0f}s.'
+                '\nMIGRATION NOT ESTIMATED : {}'.format(
+                    estimated_duration, upgrade_window, len(not_estimated_data)))
+        elif not_estimated_data:
+            _logger.info(
+                '\nEstimated migration duration {:.0f}s of upgrade window {:.0f}s,'
+                ' {} migration has no dry run estimate.'.format(
+                    estimated_duration, upgrade_window, len(not_estimated_data)))
+        return True
+
+    ####################################
+    # Utils
+    ####################################
+
+    def _get_target_domain(self):
+        """ Return evaluated target domain of the migration, restricted to
+        records past the watermark for incremental migration.
+        """
+        self.ensure_one()
+        domain = safe_eval(self.target_domain or '[]')
+        if self.incremental and self.watermark_value:
+            domain = domain + [(self.watermark_field, '>', self._get_watermark())]
+        return domain
+
+    @api.model
+    def _fill_model_name_relation(self, vals):
+        """ Return vals with model relation data to ir.model matching model_name.
+        ir.model ids are cached per registry, so loading many migrations of the
+        same model doesn't query ir.model again.
+        """
+        if not vals.get('model_name'):
+            return vals
+        return dict(vals, model_name_relation=self.env['ir.model']._get_id(
+            vals['model_name']) or False)
+
+    def _get_watermark(self):
+        """ Return stored watermark converted to the type of watermark field. """
+        self.ensure_one()
+        field = self.env[self.model_name]._fields[self.watermark_field]
+        if field.type == 'integer':
+            return int(self.watermark_value)
+        if field.type in ('float', 'monetary'):
+            return float(self.watermark_value)
+        return self.watermark_value
+
+    def _get_watermark_value(self):
+        """ Return highest watermark field value of the target records, taken
+        before the run and stored as watermark once the run is committed. A
+        datetime watermark is kept before the start of the oldest open
+        transaction, write_date of its records is its start time and they may
+        be committed later.
+        """
+        self.ensure_one()
+        target_model = self.env[self.model_name]
+        field = target_model._fields[self.watermark_field]
+        last_record = target_model.search(
+            safe_eval(self.target_domain or '[]') + [(self.watermark_field, '!=', False)],
+            order='{} desc, id desc'.format(self.watermark_field), limit=1)
+        if not last_record:
+            return self.watermark_value
+        watermark = last_record[self.watermark_field]
+        if field.type == 'datetime':
+            self.env.cr.execute("""
+                SELECT min(xact_start) AT TIME ZONE 'UTC' FROM pg_stat_activity
+                WHERE datname = current_database() AND pid != pg_backend_pid()
+            """)
+            oldest_start = self.env.cr.fetchone()[0]
+            if oldest_start:
+                # Datetime values are stored to the second
+                watermark = min(watermark, oldest_start - timedelta(seconds=1))
+            watermark = fields.Datetime.to_string(watermark)
+        elif field.type == 'date':
+            watermark = fields.Date.to_string(watermark)
+        _logger.info('\nMIGRATION : {} \nWATERMARK : {}'.format(self.name, watermark))
+        return str(watermark)
+
+    def _is_write_date_watermark(self):
+        """ Return True if the migration is incremental on write_date. """
+        self.ensure_one()
+        return self.incremental and self.watermark_field == 'write_date'
+
+    def reset_watermark(self):
+        """ Drop stored watermark, so next incremental run process every target record. """
+        self.write({
+            'watermark_value': False
+        })
+
+    @contextmanager
+    def _lock_migration(self):
+        """ Claim migration records for the duration of the block, using
+        PostgreSQL advisory locks on their ids, so a migration is never run twice
+        at the same time by a manual run, the dispatcher cron or another node.
+        Yield the claimed migration records. Locks of a crashed worker are
+        released with its database session.
+        """
+        with advisory_locks(self.pool, self.ids) as locked_ids:
+            yield self.filtered(lambda record: record.id in locked_ids)
+
+    def _filter_stale_running(self):
+        """ Return migration records left running by a crashed worker: running
+        for longer than the lease timeout while no session holds their lock.
+        """
+        if not self:
+            return self
+        self.env.cr.execute("""
+            SELECT id FROM odoo_data_migration
+            WHERE id IN %s AND migration_status = %s AND last_run < %s AND NOT {}
+        """.format(lock_held_condition('odoo_data_migration.id')), (
+            tuple(self.ids),
+            eMigrationStatus.running.name,
+            fields.Datetime.now() - timedelta(seconds=self._get_lease_timeout())))
+        stale_ids = [row[0] for row in self.env.cr.fetchall()]
+        return self.filtered(lambda record: record.id in stale_ids)
+
+    @api.model
+    def _get_lease_timeout(self):
+        """ Return seconds after which a running migration whose lock is not held
+        is considered crashed.
+        """
+        return get_int_option('data_migration_lease_timeout', 600)
+
+    @api.model
+    def _is_job_queue_enabled(self):
+        """ Return True when the run button and batch migration enqueue
+        migrations, using `data_migration_job_queue` option of config file.
+        """
+        return get_bool_option('data_migration_job_queue', False)
+
+    @api.model
+    def _get_worker_count(self):
+        """ Return number of worker used to run migrations concurrently. """
+        return get_int_option('data_migration_workers', 1)
+
+    @api.model
+    def _get_bookkeeping_tables(self):
+        """ Return tables written by the engine on the migration cursors, for
+        checkpoints and batches. They are not counted as rows written.
+        """
+        return [self.env[model_name]._table for model_name in [
+            'odoo.data.migration', 'odoo.data.migration.partition',
+            'odoo.data.migration.batch']]
+
+    @api.model
+    def _get_partition_worker_count(self):
+        """ Return maximum number of worker threads of a partitioned migration. """
+        return get_int_option('data_migration_partition_workers', 4)
+
+    @api.model
+    def _get_checkpoint_reset_fields(self):
+        """ Return fields that invalidate the stored checkpoint when changed. """
+        return ['model_name', 'migration_type', 'migration_function', 'migration_sql',
+                'execution_mode', 'target_domain', 'source_file_path', 'source_file_format']
+
+    @api.model
+    def report_progress(self, processed_count, total_count=None):
+        """ Report progress of the running migration. Can be called by migration
+        function, e.g. self.env['odoo.data.migration'].report_progress(100, 1000).
+        Progress is written in a separate transaction, so it is visible while the
+        migration is still running. Only for migrations running in a single call,
+        processed_count replaces the count, so it would overwrite the count of
+        batched migrations, reported by the engine after every batch. Do nothing
+        outside a single call migration run.
+        """
+        migration_id = self.env.context.get('data_migration_id')
+        if not migration_id:
+            return False
+        migration = self.browse(migration_id)
+        if migration._is_batched_migration():
+            return False
+        migration._update_progress(
+            processed_count=processed_count, total_count=total_count)
+        return True
+
+    def _update_progress(self, processed_count=None, total_count=None,
+                         processed_increment=0, retry_increment=0):
+        """ Write progress of the migration in a separate transaction. """
+        self.ensure_one()
+        self.env['odoo.data.migration.progress']._write_progress(
+            self.id, processed_count=processed_count, total_count=total_count,
+            processed_increment=processed_increment, retry_increment=retry_increment)
+
+    def _get_throttle(self):
+        """ Return throttle applied between batches of the migration, using
+        migration settings, or config file options when they are not set.
+        """
+        self.ensure_one()
+        return MigrationThrottle(
+            self.pool,
+            max_rows_per_second=self.throttle_max_rows_per_second or get_float_option(
+                'data_migration_max_rows_per_second', 0.0),
+            batch_sleep=self.throttle_batch_sleep or get_float_option(
+                'data_migration_batch_sleep', 0.0),
+            max_active_connections=self.throttle_max_active_connections or get_int_option(
+                'data_migration_max_active_connections', 0),
+            max_replication_lag=self.throttle_max_replication_lag or get_float_option(
+                'data_migration_max_replication_lag', 0.0))
+
+    def _get_retry(self):
+        """ Return retry policy of the batches of the migration, using
+        `data_migration_max_retries` and `data_migration_retry_backoff` options of
+        config file. Every retry is counted in the migration progress.
+        """
+        self.ensure_one()
+
+        def on_retry():
+            # Pending writes and cache of the rolled back batch are stale
+            self.env.clear()
+            self._update_progress(retry_increment=1)
+
+        return MigrationRetry(
+            self.env.cr,
+            max_retries=get_int_option('data_migration_max_retries', 3),
+            backoff_sleep=get_float_option('data_migration_retry_backoff', 1.0),
+            on_retry=on_retry)
+
+    def _get_retry_count(self):
+        """ Return number of batches retried during the current run. """
+        self.ensure_one()
+        progress = self.env['odoo.data.migration.progress'].search([
+            ('migration_id', '=', self.id)])
+        return progress.retry_count
+
+    def _get_timeouts(self):
+        """ Return tuple of lock timeout and statement timeout in seconds, using
+        migration settings, or config file options when they are not set.
+        """
+        self.ensure_one()
+        return (
+            self.lock_timeout or get_float_option('data_migration_lock_timeout', 0.0),
+            self.statement_timeout or get_float_option(
+                'data_migration_statement_timeout', 0.0))
+
+    def _set_timeouts(self):
+        """ Apply lock and statement timeouts of the migration to the session of
+        the migration cursor.
+        """
+        self.ensure_one()
+        lock_timeout, statement_timeout = self._get_timeouts()
+        if lock_timeout or statement_timeout:
+            self.env.cr.execute(
+                "SELECT set_config('lock_timeout', %s, false),"
+                " set_config('statement_timeout', %s, false)",
+                ('{}ms'.format(int(lock_timeout * 1000)),
+                 '{}ms'.format(int(statement_timeout * 1000))))
+
+    def _reset_timeouts(self):
+        """ Restore lock and statement timeouts of the migration cursor to the
+        database defaults, the cursor runs other migrations afterwards.
+        """
+        self.ensure_one()
+        if any(self._get_timeouts()):
+            self.env.cr.execute('RESET lock_timeout; RESET statement_timeout')
+
+    def _get_migration_context(self):
+        """ Return context of the migration payload. """
+        self.ensure_one()
+        context = {'data_migration_id': self.id}
+        if self.fast_mode:
+            context.update(FAST_MODE_CONTEXT)
+        return context
+
+    def _flush_batch(self):
+        """ In fast mode, recompute stored fields and write every pending change
+        of the batch at once, before the batch is committed.
+        """
+        self.ensure_one()
+        if self.fast_mode:
+            # Flush all models, recomputation may hit models other than the target
+            self.env['base'].flush()
+
+    def _get_invalidate_fields(self):
+        """ Return list of source model fields invalidated after migration SQL. """
+        self.ensure_one()
+        return [fname.strip() for fname in (self.sql_invalidate_fields or '').split(',')
+                if fname.strip()]
+
+    def _get_prefetch_fields(self):
+        """ Return list of source model fields prefetched for every batch. """
+        self.ensure_one()
+        return [fname.strip() for fname in (self.prefetch_fields or '').split(',')
+                if fname.strip()]
+
+    def _is_batched_migration(self):
+        """ Return True if the migration runs in batches of records. """
+        self.ensure_one()
+        return self.migration_type != eMigrationType.function.name or \
+            self.execution_mode != eExecutionMode.single.name
+
+    def reset_checkpoint(self):
+        """ Drop stored checkpoint and partitions, so next run start from the
+        beginning.
+        """
+        self.write({
+            'checkpoint_id': 0
+        })
+        self.mapped('partition_ids').unlink()
+
+    @contextmanager
+    def _profile_run(self):
+        """ Yield profiler of the run when profile is set, or None. The number of
+        hotspots and statements reported is the `data_migration_profile_top`
+        option of config file, default to 20.
+        """
+        self.ensure_one()
+        if not self.profile:
+            yield None
+            return
+        with MigrationProfiler(
+                self.env.cr, get_int_option('data_migration_profile_top', 20)) as profiler:
+            yield profiler
+
+    def _get_profile_vals(self, profiler):
+        """ Return run history values storing the profile summary and report. """
+        self.ensure_one()
+        _logger.info('\nMIGRATION : {} \nPROFILE :\n{}'.format(
+            self.name, profiler.summary))
+        return {
+            'profile_summary': profiler.summary,
+            'profile_report': base64.b64encode(profiler.report.encode()),
+            'profile_report_name': 'migration_{}_profile.txt'.format(self.id)
+        }
+
+    def _get_run_statistics(self, processed_count, metrics, retry_count=0):
+        """ Return tuple of migration and run history values storing processed
+        record count, throughput, retry count and metrics of a run.
+        """
+        _logger.info(
+            '\nMIGRATION : {} \nDURATION : {:.2f}s \nCPU TIME : {:.2f}s'
+            '\nSQL : {} queries in {:.2f}s \nROWS WRITTEN : {} \nPEAK MEMORY GROWTH : {:.1f}MB'
+            '\nRETRIES : {}'.format(
+                self.name, metrics.duration, metrics.cpu_time, metrics.query_count,
+                metrics.query_time, metrics.rows_written, metrics.memory_peak,
+                retry_count))
+        throughput = processed_count / metrics.duration if metrics.duration else 0.0
+        return {
+            'processed_record_count': processed_count,
+            'last_run_duration': metrics.duration,
+            'throughput': throughput,
+            'last_run_cpu_time': metrics.cpu_time,
+            'last_run_query_count': metrics.query_count,
+            'last_run_query_time': metrics.query_time,
+            'last_run_rows_written': metrics.rows_written,
+            'last_run_memory_peak': metrics.memory_peak,
+            'last_run_retry_count': retry_count
+        }, {
+            'processed_record_count': processed_count,
+            'duration': metrics.duration,
+            'throughput': throughput,
+            'cpu_time': metrics.cpu_time,
+            'query_count': metrics.query_count,
+            'query_time': metrics.query_time,
+            'rows_written': metrics.rows_written,
+            'memory_peak': metrics.memory_peak,
+            'retry_count': retry_count
+        }
+
+    @contextmanager
+    def _status_env(self):
+        """ Yield environment of a separate status cursor, committed on exit.
+        Status written through it is visible right away, without committing the
+        migration payload. Migration records written through it need to be
+        committed already, and must not be written by the current transaction.
+        """
+        # Pending writes belong to the migration cursor
+        self.env['base'].flush()
+        with self.pool.cursor() as cr:
+            yield self.env(cr=cr)
+
+    def mark_running(self):
+        """ Mark migration records as running, and start a new run history.
+        Called through the status cursor.
+        """
+        run_obj = self.env['odoo.data.migration.run']
+        now = datetime.now()
+        # Close run history left running by an interrupted run
+        run_obj.search([
+            ('migration_id', 'in', self.ids),
+            ('migration_status', '=', eMigrationStatus.running.name)
+        ]).write({
             'migration_status': eMigrationStatus.failed.name,
-            'error_traceback': error_traceback
+            'end_time': now,
+            'error_traceback_compressed': run_obj.compress_traceback(
+                'Run was interrupted.')
         })
-        # Commit to avoid running error when using cron
-        self.env.cr.commit()
+        self.write({
+            'migration_status': eMigrationStatus.running.name,
+            'last_run': now
+        })
+        run_obj.create([{
+            'migration_id': record.id,
+            'start_time': now,
+            'fast_mode': record.fast_mode
+        } for record in self])
+        self.env['odoo.data.migration.progress']._reset_progress(self.ids)
+
+    def mark_success(self, vals=None, run_vals=None):
+        """ Mark migration records as success. Called through the status cursor. """
+        self._close_current_run(eMigrationStatus.done.name, run_vals=run_vals)
+        self.write(dict(
+            vals or {},
+            migration_status=eMigrationStatus.done.name,
+            error_traceback='',
+            checkpoint_id=0))
+
+    def mark_failed(self, error_traceback, vals=None, run_vals=None):
+        """ Mark migration records as failed, also log the error traceback.
+        Called through the status cursor.
+        """
+        self._close_current_run(
+            eMigrationStatus.failed.name, error_traceback, run_vals=run_vals)
+        self.write(dict(
+            vals or {},
+            migration_status=eMigrationStatus.failed.name,
+            error_traceback=error_traceback))
+
+    def _close_current_run(self, migration_status, error_traceback=False, run_vals=None):
+        """ Finish run history of the running migration records. """
+        run_obj = self.env['odoo.data.migration.run']
+        run_obj.search([
+            ('migration_id', 'in', self.ids),
+            ('migration_status', '=', eMigrationStatus.running.name)
+        ]).write(dict(
+            run_vals or {},
+            migration_status=migration_status,
+            end_time=datetime.now(),
+            error_traceback_compressed=run_obj.compress_traceback(error_traceback)))
+
+    def _mark_skipped(self):
+        """ Keep migration in queue because its dependencies are not done, also
+        log the reason in error traceback.
+        """
+        self.ensure_one()
+        pending_dependency = self.dependency_ids.filtered(
+            lambda dependency: dependency.migration_status != eMigrationStatus.done.name)
+        message = 'Skipped, dependency {} is not done.'.format(
+            ', '.join(pending_dependency.mapped('name')))
+        _logger.warning('\nMIGRATION : {} \n{}'.format(self.name, message))
+        with self._status_env() as status_env:
+            self.with_env(status_env).write({
+                'migration_status': eMigrationStatus.queued.name,
+                'error_traceback': message
+            })
 
     def requeue_migration(self):
         """ Requeue migration. With this, every migration that use running_method
-        at upgrade will be run in the next upgrade.
+        at upgrade will be run in the next upgrade. Chunked migration that failed
+        will continue from its checkpoint.
         """
         self.write({
             'migration_status': eMigrationStatus.queued.name
         })
 
-    def _deactivate_cron(self):
-        """ Deactivate cron record. """
-        self.ensure_one()
-        if self.ir_cron_reference:
-            self.ir_cron_reference.write({
-                'active': False,
-                'numbercall': 0
-            })
-
     def batch_cancel_migration(self):
         """
         Function to cancel migration as batch. Used for contextual action button
-        in list view.
+        in list view. Queued jobs of the cancelled migrations are cancelled too.
         """
-        for record in self:
-            if record.migration_status not in [
-                    eMigrationStatus.done.name,
-                    eMigrationStatus.running.name,
-                    eMigrationStatus.cancelled.name]:
-                record.cancel_migration()
+        cancel_data = self.filtered(lambda record: record.migration_status not in [
+            eMigrationStatus.done.name,
+            eMigrationStatus.running.name,
+            eMigrationStatus.cancelled.name])
+        cancel_data.write({
+            'migration_status': eMigrationStatus.cancelled.name
+        })
+        cancel_data.mapped('job_ids').cancel_job()
 
     def cancel_migration(self):
-        """ Cancel migration. """
+        """ Cancel migration. Cancelled migration that using cron job won't be
+        picked up by the dispatcher cron, and its queued jobs are cancelled.
+        """
         self.ensure_one()
-        if self.running_method == eRunningMethod.cron_job.name:
-            try:
-                self._deactivate_cron()
-                self.write({
-                    'migration_status': eMigrationStatus.cancelled.name
-                })
-            except Exception:
-                raise ValidationError(
-                    "Cron failed to cancel. The cron job might currently still running.")
-        else:
-            self.write({
-                'migration_status': eMigrationStatus.cancelled.name
-            })
+        self.write({
+            'migration_status': eMigrationStatus.cancelled.name
+        })
+        self.job_ids.cancel_job()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import traceback
+
+from odoo import fields, models
+
+from ..utils.enum import eMigrationStatus
+
+_logger = logging.getLogger(__name__)
+
+
+class OdooDataMigrationPartition(models.Model):
+    _name = 'odoo.data.migration.partition'
+    _description = 'Odoo Data Migration Partition'
+    _order = 'min_id'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    min_id = fields.Integer('First ID', required=True)
+    max_id = fields.Integer('Last ID', required=True)
+    checkpoint_id = fields.Integer('Checkpoint (Last Processed ID)')
+    processed_record_count = fields.Integer('Processed Records')
+    migration_status = fields.Selection(
+        selection=[
+            (eMigrationStatus.queued.name,
+             'Queued'),
+            (eMigrationStatus.running.name,
+             'Running'),
+            (eMigrationStatus.done.name,
+             'Done'),
+            (eMigrationStatus.failed.name,
+             'Failed')],
+        default=eMigrationStatus.queued.name,
+        required=True)
+    error_traceback = fields.Text('Error Debug Traceback')
+
+    def run_partition(self):
+        """ Run the migration function on the id range of the partition as chunked
+        migration, continuing after the partition checkpoint. Timeouts of the
+        migration are applied to the worker cursor during the run.
+        """
+        self.ensure_one()
+        migration = self.migration_id
+        self.write({
+            'migration_status': eMigrationStatus.running.name,
+            'error_traceback': ''
+        })
+        # Timeouts are committed too, so a rolled back batch doesn't reset them
+        migration._set_timeouts()
+        # Commit to make the partition status visible to the parent migration
+        self.env.cr.commit()
+
+        domain = migration._get_target_domain() + [
+            ('id', '>=', self.min_id),
+            ('id', '<=', self.max_id)
+        ]
+        _logger.info('\nMIGRATION : {} \nRUNNING PARTITION : {} - {}'.format(
+            migration.name, self.min_id, self.max_id))
+
+        try:
+            processed_count = migration._process_chunks(domain, self)
+        except Exception:
+            traceback_message = traceback.format_exc()
+            # Drop the failed batch, committed batches are kept by checkpoint
+            self.env.cr.rollback()
+            self.write({
+                'migration_status': eMigrationStatus.failed.name,
+                'error_traceback': traceback_message
+            })
+        else:
+            self.write({
+                'migration_status': eMigrationStatus.done.name,
+                'processed_record_count': processed_count
+            })
+        migration._reset_timeouts()
+        self.env.cr.commit()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class OdooDataMigrationProgress(models.Model):
+    _name = 'odoo.data.migration.progress'
+    _description = 'Odoo Data Migration Progress'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    processed_count = fields.Integer('Processed')
+    retry_count = fields.Integer('Retries')
+    total_count = fields.Integer('Total')
+    started_at = fields.Datetime('Started At')
+    updated_at = fields.Datetime('Updated At')
+    percentage = fields.Float('Progress (%)', compute='_compute_rate')
+    rate = fields.Float('Rate (records/s)', compute='_compute_rate')
+    eta = fields.Datetime('Estimated End', compute='_compute_rate')
+
+    _sql_constraints = [
+        ('migration_id_unique', 'unique(migration_id)',
+         'Migration can only have one progress record.')
+    ]
+
+    ####################################
+    # Compute function
+    ####################################
+    @api.depends('processed_count', 'total_count', 'started_at', 'updated_at')
+    def _compute_rate(self):
+        """ Compute progress percentage, rate and estimated end time. """
+        for record in self:
+            elapsed = (record.updated_at - record.started_at).total_seconds() \
+                if record.started_at and record.updated_at else 0.0
+            record.rate = record.processed_count / elapsed if elapsed else 0.0
+            record.percentage = min(
+                100.0 * record.processed_count / record.total_count, 100.0) \
+                if record.total_count else 0.0
+            remaining_count = max(record.total_count - record.processed_count, 0)
+            record.eta = record.updated_at + timedelta(
+                seconds=remaining_count / record.rate) \
+                if record.rate and record.total_count else False
+
+    ####################################
+    # Utils
+    ####################################
+
+    @api.model
+    def _reset_progress(self, migration_ids):
+        """ Start a new progress for migration_ids, in a single statement on the
+        current cursor. Used when the migrations are marked as running.
+        """
+        if not migration_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO odoo_data_migration_progress (
+                migration_id, processed_count, total_count, retry_count, started_at,
+                updated_at, create_uid, create_date, write_uid, write_date)
+            SELECT migration_id, 0, 0, 0, now() at time zone 'UTC',
+                now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC',
+                %(uid)s, now() at time zone 'UTC'
+            FROM unnest(%(migration_ids)s) AS migration_id
+            ON CONFLICT (migration_id) DO UPDATE SET
+                processed_count = 0,
+                total_count = 0,
+                retry_count = 0,
+                started_at = EXCLUDED.started_at,
+                updated_at = EXCLUDED.updated_at,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, {
+            'migration_ids': list(migration_ids),
+            'uid': self.env.uid
+        })
+        self.invalidate_cache()
+
+    @api.model
+    def _write_progress(self, migration_id, processed_count=None, total_count=None,
+                        processed_increment=0, retry_increment=0):
+        """ Write progress of a migration using a separate cursor, so progress is
+        visible outside the migration transaction. processed_count sets the
+        processed count, processed_increment adds to it so several workers can
+        report on the same migration, retry_increment adds to the retry count.
+        """
+        with self.pool.cursor() as cr:
+            # Partition workers report on the same row, wait for the row lock
+            # instead of failing with a serialization error
+            cr.execute('SET TRANSACTION ISOLATION LEVEL READ COMMITTED')
+            cr.execute("""
+                INSERT INTO odoo_data_migration_progress (
+                    migration_id, processed_count, total_count, retry_count, started_at,
+                    updated_at, create_uid, create_date, write_uid, write_date)
+                VALUES (
+                    %(migration_id)s, COALESCE(%(processed_count)s, %(processed_increment)s),
+                    COALESCE(%(total_count)s, 0), %(retry_increment)s, now() at time zone 'UTC',
+                    now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC',
+                    %(uid)s, now() at time zone 'UTC')
+                ON CONFLICT (migration_id) DO UPDATE SET
+                    processed_count = CASE
+                        WHEN %(processed_count)s IS NOT NULL THEN %(processed_count)s
+                        ELSE odoo_data_migration_progress.processed_count + %(processed_increment)s
+                    END,
+                    total_count = COALESCE(
+                        %(total_count)s, odoo_data_migration_progress.total_count),
+                    retry_count = COALESCE(odoo_data_migration_progress.retry_count, 0)
+                        + %(retry_increment)s,
+                    updated_at = EXCLUDED.updated_at,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+            """, {
+                'migration_id': migration_id,
+                'processed_count': processed_count,
+                'total_count': total_count,
+                'processed_increment': processed_increment,
+                'retry_increment': retry_increment,
+                'uid': self.env.uid
+            })
+        self.invalidate_cache()
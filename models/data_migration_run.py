@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import zlib
+
+from odoo import api, fields, models, tools
+
+from ..utils.enum import eMigrationStatus
+
+
+class OdooDataMigrationRun(models.Model):
+    _name = 'odoo.data.migration.run'
+    _description = 'Odoo Data Migration Run'
+    _order = 'id desc'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record',
+        required=True, ondelete='cascade', index=True)
+    start_time = fields.Datetime('Start Time', required=True)
+    end_time = fields.Datetime('End Time')
+    migration_status = fields.Selection(
+        selection=[
+            (eMigrationStatus.running.name,
+             'Running'),
+            (eMigrationStatus.done.name,
+             'Done'),
+            (eMigrationStatus.failed.name,
+             'Failed')],
+        default=eMigrationStatus.running.name,
+        required=True)
+    duration = fields.Float('Duration (s)')
+    cpu_time = fields.Float(
+        'CPU Time (s)',
+        help='CPU time of the thread running the migration and of its partition\
+             workers.')
+    query_count = fields.Integer(
+        'SQL Queries',
+        help='SQL statements of the migration cursor and of the partition worker cursors.')
+    query_time = fields.Float('SQL Time (s)')
+    rows_written = fields.Integer(
+        'Rows Written',
+        help='Rows affected by INSERT, UPDATE and DELETE statements of the migration,\
+             checkpoints and other statements of the engine are not included.')
+    memory_peak = fields.Float(
+        'Peak Memory Growth (MB)',
+        help='Growth of the peak resident memory of the server process during the run.')
+    processed_record_count = fields.Integer('Processed Records')
+    throughput = fields.Float('Throughput (records/s)')
+    retry_count = fields.Integer(
+        'Retries', help='Batches retried after a deadlock, serialization failure or lock timeout.')
+    fast_mode = fields.Boolean(
+        'Fast Mode', help='Migration function was run in fast mode.')
+    profile_summary = fields.Text(
+        'Profile Summary', help='Python hotspots and slowest SQL statements of the run.')
+    profile_report = fields.Binary('Profile Report', attachment=True)
+    profile_report_name = fields.Char('Profile Report Name')
+    error_traceback_compressed = fields.Binary(
+        'Compressed Error Traceback', attachment=False)
+    error_traceback = fields.Text(
+        'Error Debug Traceback', compute='_compute_error_traceback')
+
+    ####################################
+    # Compute function
+    ####################################
+    @api.depends('error_traceback_compressed')
+    def _compute_error_traceback(self):
+        """ Decompress stored error traceback. """
+        for record in self:
+            record.error_traceback = self.decompress_traceback(
+                record.error_traceback_compressed)
+
+    ####################################
+    # Utils
+    ####################################
+
+    @api.model
+    def compress_traceback(self, error_traceback):
+        """ Return error traceback compressed with zlib, encoded as base64. """
+        if not error_traceback:
+            return False
+        return base64.b64encode(zlib.compress(error_traceback.encode()))
+
+    @api.model
+    def decompress_traceback(self, compressed_traceback):
+        """ Return error traceback from value of compress_traceback. """
+        if not compressed_traceback:
+            return False
+        return zlib.decompress(base64.b64decode(compressed_traceback)).decode()
+
+
+class OdooDataMigrationRunReport(models.Model):
+    _name = 'odoo.data.migration.run.report'
+    _description = 'Odoo Data Migration Run Report'
+    _auto = False
+    _order = 'p95_duration desc'
+
+    migration_id = fields.Many2one(
+        'odoo.data.migration', string='Data Migration Record', readonly=True)
+    run_count = fields.Integer('Runs', readonly=True)
+    failed_count = fields.Integer('Failed Runs', readonly=True)
+    failure_rate = fields.Float(
+        'Failure Rate (%)', readonly=True, group_operator='avg')
+    avg_duration = fields.Float(
+        'Average Duration (s)', readonly=True, group_operator='avg')
+    p50_duration = fields.Float(
+        'P50 Duration (s)', readonly=True, group_operator='avg')
+    p95_duration = fields.Float(
+        'P95 Duration (s)', readonly=True, group_operator='max')
+    max_duration = fields.Float(
+        'Max Duration (s)', readonly=True, group_operator='max')
+    last_start_time = fields.Datetime('Last Run', readonly=True)
+
+    def init(self):
+        """ Aggregate finished runs per migration. """
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW {} AS (
+                SELECT
+                    run.migration_id AS id,
+                    run.migration_id AS migration_id,
+                    count(*) AS run_count,
+                    count(*) FILTER (WHERE run.migration_status = %(failed)s) AS failed_count,
+                    100.0 * count(*) FILTER (WHERE run.migration_status = %(failed)s)
+                        / count(*) AS failure_rate,
+                    avg(run.duration) AS avg_duration,
+                    percentile_cont(0.5) WITHIN GROUP (ORDER BY run.duration) AS p50_duration,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY run.duration) AS p95_duration,
+                    max(run.duration) AS max_duration,
+                    max(run.start_time) AS last_start_time
+                FROM odoo_data_migration_run run
+                WHERE run.migration_status != %(running)s
+                GROUP BY run.migration_id
+            )
+        """.format(self._table), {
+            'failed': eMigrationStatus.failed.name,
+            'running': eMigrationStatus.running.name
+        })
@@ -2,6 +2,9 @@
 
 from odoo import models, fields, api
 
+# Records whose chunk already failed once in test_unittest_chunk_retry
+RETRIED_RECORD_IDS = set()
+
 
 class OdooDataMigrationTest(models.Model):
     _name = 'odoo.data.migration.test'
@@ -15,10 +18,59 @@ class OdooDataMigrationTest(models.Model):
         })
         return rec
 
+    def test_unittest_noop(self):
+        return True
+
+    def test_unittest_chunk(self):
+        for record in self:
+            record.name = 'Migrated'
+
+    def test_unittest_chunk_nok(self):
+        for record in self:
+            if record.name == 'Broken':
+                raise ValueError('Broken record')
+            record.name = 'Migrated'
+
+    def test_unittest_fast_mode(self):
+        for record in self:
+            record.name = 'Fast' if self.env.context.get('tracking_disable') else 'Slow'
+
+    def test_unittest_chunk_retry(self):
+        if self.ids[0] not in RETRIED_RECORD_IDS:
+            RETRIED_RECORD_IDS.add(self.ids[0])
+            self.env.cr.execute(
+                "DO $$ BEGIN RAISE EXCEPTION 'Retry' USING ERRCODE = '40001'; END $$")
+        self.test_unittest_chunk()
+
+    def test_unittest_show_timeout(self):
+        self.env.cr.execute('SHOW lock_timeout')
+        lock_timeout = self.env.cr.fetchone()[0]
+        for record in self:
+            record.name = lock_timeout
+
+    def test_unittest_rollback(self):
+        self.create({
+            'name': 'Rolled Back'
+        })
+        self.env.cr.rollback()
+
     def test_unittest_nok(self):
         num = 'a'
         int(num)
 
+    def test_unittest_partial_nok(self):
+        self.create({
+            'name': 'Partial'
+        })
+        num = 'a'
+        int(num)
+
+    @api.model
+    def test_unittest_import(self, rows):
+        self.create([{
+            'name': row['name']
+        } for row in rows])
+
     @api.model
     def cleanup_data(self):
         data = self.search([])
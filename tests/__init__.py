@@ -1,3 +1,5 @@
 from . import test_common
 from . import test_data_migration
 from . import test_data_migration_cron
+from . import test_data_migration_benchmark
+from . import test_data_migration_job
@@ -23,7 +23,8 @@ class TestOdooDataMigrationCommon(TransactionCase):
             cls,
             migration_name: str,
             model_name: str,
-            function_name: str) -> OdooDataMigration:
+            function_name: str,
+            extra_vals: dict = None) -> OdooDataMigration:
         payload = {
             'name': migration_name,
             'description': migration_name,
@@ -31,6 +32,7 @@ class TestOdooDataMigrationCommon(TransactionCase):
             'migration_function': function_name,
             'running_method': eRunningMethod.at_upgrade.name
         }
+        payload.update(extra_vals or {})
         migration_record = cls.DATA_MIGRATION_MODEL.create(payload)
         return migration_record
 
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from odoo.exceptions import ValidationError
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from odoo.exceptions import UserError, ValidationError
 from odoo.tests.common import tagged
+from odoo.tools.config import config
 
-from ..utils.enum import eMigrationStatus
+from ..utils.enum import eExecutionMode, eMigrationStatus, eMigrationType
+from ..utils.lock import advisory_locks
+from ..utils.throttle import MigrationThrottle
 from .test_common import TestOdooDataMigrationCommon
 
 
@@ -58,22 +67,22 @@ class TestOdooDataMigration(TestOdooDataMigrationCommon):
 
     def test_3_create_and_run_migration_nok_2(self):
         # Create a migration record
-        # Trigger the error using undefined function in target model
+        # Trigger the error using undefined function in target model, it
+        # should be rejected when the migration is created
+        with self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 3 At Upgrade NOK Undefined Function',
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_nok_undefined')
+
+        # Model relation data is filled out without an extra write
         migration_record = self._create_migration_at_upgrade(
-            migration_name='Test Migration 3 At Upgrade NOK Undefined Function',
+            migration_name='Test Migration 3 At Upgrade Model Relation',
             model_name=self.TEST_MODEL_NAME,
-            function_name='test_unittest_nok_undefined')
-
-        # Run the migration
-        migration_record.run_migration()
-
-        # Check migration result
-        # This sample migration should output error due to the function is
-        # undefined
+            function_name='test_unittest_ok')
         self.assertEqual(
-            migration_record.migration_status,
-            eMigrationStatus.failed.name)
-        self.assertTrue(len(migration_record.error_traceback) > 0)
+            migration_record.model_name_relation.model,
+            self.TEST_MODEL_NAME)
 
         # Cleanup
         self.TEST_MODEL_OBJ.cleanup_data()
@@ -111,3 +120,896 @@ class TestOdooDataMigration(TestOdooDataMigrationCommon):
 
         # Cleanup
         self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_6_create_and_run_chunked_migration_ok(self):
+        # Create target records, then run a chunked migration that processes
+        # them in batches smaller than the target count.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(5)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 6 At Upgrade Chunked',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2,
+                'prefetch_fields': 'name'
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration result
+        # Every target record should be processed exactly once
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 5)
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(set(test_record.mapped('name')), {'Migrated'})
+
+        # Run metrics should be collected
+        self.assertTrue(migration_record.last_run_duration > 0)
+        self.assertTrue(migration_record.last_run_query_count > 0)
+        # Checkpoints written by the engine are not counted as rows written
+        self.assertEqual(migration_record.last_run_rows_written, 5)
+        self.assertTrue(migration_record.last_run_memory_peak >= 0)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_7_test_chunked_migration_constrain(self):
+        # Chunked migration needs a positive batch size
+        with self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 7 At Upgrade NOK Batch Size',
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_chunk',
+                extra_vals={
+                    'execution_mode': eExecutionMode.chunked.name,
+                    'batch_size': 0
+                })
+
+        # Prefetched fields need to exist in source model
+        with self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 7 At Upgrade NOK Prefetch',
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_chunk',
+                extra_vals={
+                    'execution_mode': eExecutionMode.chunked.name,
+                    'prefetch_fields': 'name, undefined_field'
+                })
+
+        # Partition count is bounded by the partition workers
+        with patch.dict(config.options, {'data_migration_partition_workers': 2}), \
+                self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 7 At Upgrade NOK Partition Count',
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_chunk',
+                extra_vals={
+                    'execution_mode': eExecutionMode.partitioned.name,
+                    'partition_count': 3
+                })
+
+    def test_8_resume_chunked_migration_from_checkpoint(self):
+        # Run a chunked migration that fails on the last batch, then fix the
+        # data and rerun it. Rerun should continue after the checkpoint.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(4)])
+        broken_record = self.TEST_MODEL_OBJ.create({'name': 'Broken'})
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 8 At Upgrade Checkpoint',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk_nok',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'batch_size': 2
+            })
+
+        # Run the migration, the last batch should fail
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.failed.name)
+        self.assertTrue(migration_record.checkpoint_id > 0)
+        self.assertTrue(migration_record.checkpoint_id < broken_record.id)
+
+        # Fix the data and rerun, only the remaining batch is processed
+        broken_record.name = 'Fixed'
+        migration_record.requeue_migration()
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 1)
+        self.assertEqual(migration_record.checkpoint_id, 0)
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(set(test_record.mapped('name')), {'Migrated'})
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_9_run_parallel_migration_ok(self):
+        # Run several migrations using worker threads, every migration
+        # should finish using its own cursor
+        migration_records = self.DATA_MIGRATION_MODEL.browse()
+        for index in range(3):
+            migration_records |= self._create_migration_at_upgrade(
+                migration_name='Test Migration 9 At Upgrade Parallel {}'.format(index),
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_ok')
+
+        # Run the migration
+        migration_records.parallel_migration(worker_count=2)
+
+        # Check migration result
+        # Each migration should create a new record in test model
+        self.assertEqual(
+            set(migration_records.mapped('migration_status')),
+            {eMigrationStatus.done.name})
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(len(test_record), 3)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_10_run_partitioned_migration(self):
+        # Run a partitioned migration where one partition fails. The parent
+        # migration should fail with the partition traceback, and a rerun
+        # should only run the failed partition.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(5)])
+        broken_record = self.TEST_MODEL_OBJ.create({'name': 'Broken'})
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 10 At Upgrade Partitioned',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk_nok',
+            extra_vals={
+                'execution_mode': eExecutionMode.partitioned.name,
+                'batch_size': 2,
+                'partition_count': 2
+            })
+
+        # Run the migration, partition holding the broken record should fail
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.failed.name)
+        self.assertEqual(len(migration_record.partition_ids), 2)
+        self.assertEqual(
+            sorted(migration_record.partition_ids.mapped('migration_status')),
+            [eMigrationStatus.done.name, eMigrationStatus.failed.name])
+        self.assertIn('Broken record', migration_record.error_traceback)
+
+        # Fix the data and rerun, the done partition is kept
+        broken_record.name = 'Fixed'
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(
+            set(migration_record.partition_ids.mapped('migration_status')),
+            {eMigrationStatus.done.name})
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(set(test_record.mapped('name')), {'Migrated'})
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_11_run_migration_with_dependency(self):
+        # Run migrations with dependencies as batch. Migration depending on a
+        # failed migration should be skipped, the others should run in order.
+        failed_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 11 At Upgrade Dependency NOK',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_nok')
+        skipped_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 11 At Upgrade Dependency Skipped',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok',
+            extra_vals={'dependency_ids': [(6, 0, failed_record.ids)]})
+        first_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 11 At Upgrade Dependency OK',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        second_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 11 At Upgrade Dependency OK 2',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok',
+            extra_vals={'dependency_ids': [(6, 0, first_record.ids)]})
+
+        # Run the migration
+        (second_record | skipped_record | first_record | failed_record).batch_migration()
+
+        # Check migration result
+        self.assertEqual(
+            failed_record.migration_status,
+            eMigrationStatus.failed.name)
+        self.assertEqual(
+            skipped_record.migration_status,
+            eMigrationStatus.queued.name)
+        self.assertIn('Skipped', skipped_record.error_traceback)
+        self.assertEqual(
+            first_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(
+            second_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(len(self.TEST_MODEL_OBJ.search([])), 2)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_12_test_dependency_constrain(self):
+        # Circular dependency should be rejected
+        first_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 12 At Upgrade Circular',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        second_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 12 At Upgrade Circular 2',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok',
+            extra_vals={'dependency_ids': [(6, 0, first_record.ids)]})
+        with self.assertRaises(ValidationError):
+            first_record.write({'dependency_ids': [(6, 0, second_record.ids)]})
+
+    def test_13_run_history(self):
+        # Run a migration twice, first failing then succeeding. Every run
+        # should be kept in run history and aggregated in run report.
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 13 At Upgrade Run History',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_nok')
+        migration_record.run_migration()
+        migration_record.write({'migration_function': 'test_unittest_ok'})
+        migration_record.run_migration()
+
+        # Check run history
+        migration_record.invalidate_cache()
+        self.assertEqual(migration_record.run_count, 2)
+        success_run, failed_run = migration_record.run_ids
+        self.assertEqual(success_run.migration_status, eMigrationStatus.done.name)
+        self.assertFalse(success_run.error_traceback)
+        self.assertTrue(success_run.end_time)
+        self.assertEqual(failed_run.migration_status, eMigrationStatus.failed.name)
+        self.assertIn('ValueError', failed_run.error_traceback)
+
+        # Check run report
+        report = self.env['odoo.data.migration.run.report'].search([
+            ('migration_id', '=', migration_record.id)])
+        self.assertEqual(report.run_count, 2)
+        self.assertEqual(report.failed_count, 1)
+        self.assertAlmostEqual(report.failure_rate, 50.0)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_14_create_and_run_sql_migration(self):
+        # Run a SQL migration in batches, every row should be updated and the
+        # ORM cache should be invalidated afterwards.
+        test_records = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(5)])
+        self.assertEqual(test_records[0].name, 'Chunk 0')
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 14 At Upgrade SQL',
+            model_name=self.TEST_MODEL_NAME,
+            function_name=False,
+            extra_vals={
+                'migration_type': eMigrationType.sql.name,
+                'migration_sql': """
+                    UPDATE odoo_data_migration_test SET name = 'Migrated'
+                    WHERE id BETWEEN %(min_id)s AND %(max_id)s
+                        AND name LIKE 'Chunk%%'
+                """,
+                'sql_invalidate_fields': 'name',
+                'batch_size': 2
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration result
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 5)
+        self.assertEqual(set(test_records.mapped('name')), {'Migrated'})
+
+        # Id ranges start at the first id, not at 0
+        migration_record.invalidate_cache()
+        self.assertEqual(
+            migration_record.progress_total_count,
+            max(test_records.ids) - min(test_records.ids) + 1)
+
+        # SQL migration needs migration SQL
+        with self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 14 At Upgrade SQL NOK',
+                model_name=self.TEST_MODEL_NAME,
+                function_name=False,
+                extra_vals={'migration_type': eMigrationType.sql.name})
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_15_dry_run_migration(self):
+        # Dry run a chunked migration on a sample, it should estimate the whole
+        # migration without changing any record.
+        test_records = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(5)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 15 At Upgrade Dry Run',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'dry_run_sample_size': 2
+            })
+
+        # Dry run the migration
+        migration_record.action_dry_run()
+
+        # Check estimate, and that sample changes are rolled back
+        self.assertTrue(migration_record.dry_run_date)
+        self.assertEqual(migration_record.estimated_record_count, 5)
+        self.assertTrue(migration_record.estimated_duration > 0)
+        self.assertTrue(migration_record.estimated_query_count > 0)
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.queued.name)
+        self.assertEqual(test_records[0].name, 'Chunk 0')
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_16_throttled_chunked_migration(self):
+        # Run a chunked migration limited to a rows per second rate, it should
+        # be stretched to at least the time needed by the rate.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(4)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 16 At Upgrade Throttled',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2,
+                'throttle_max_rows_per_second': 8,
+                'throttle_max_active_connections': 10000
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration result
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertTrue(migration_record.last_run_duration >= 0.5)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_17_chunked_migration_progress(self):
+        # Run a chunked migration, progress should be reported for every
+        # processed chunk and complete at the end of the run.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(5)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 17 At Upgrade Progress',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration progress
+        migration_record.invalidate_cache()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.progress_processed_count, 5)
+        self.assertEqual(migration_record.progress_total_count, 5)
+        self.assertEqual(migration_record.progress_percentage, 100.0)
+
+        # Run again, progress should start over instead of adding up
+        migration_record.run_migration()
+        migration_record.invalidate_cache()
+        self.assertEqual(migration_record.progress_processed_count, 5)
+        self.assertEqual(migration_record.progress_total_count, 5)
+
+        # Report progress outside a migration run does nothing
+        self.assertFalse(self.DATA_MIGRATION_MODEL.report_progress(1, 2))
+
+        # Report progress of a batched migration is ignored, the engine counts it
+        self.assertFalse(self.DATA_MIGRATION_MODEL.with_context(
+            data_migration_id=migration_record.id).report_progress(1, 2))
+        migration_record.invalidate_cache()
+        self.assertEqual(migration_record.progress_processed_count, 5)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_18_incremental_migration(self):
+        # Run an incremental migration twice, the second run should only
+        # process records created after the first run.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(3)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 18 At Upgrade Incremental',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'batch_size': 2,
+                'incremental': True,
+                'watermark_field': 'id'
+            })
+
+        # Run the migration, every record is processed
+        migration_record.run_migration()
+        self.assertEqual(migration_record.processed_record_count, 3)
+        self.assertEqual(
+            int(migration_record.watermark_value),
+            max(self.TEST_MODEL_OBJ.search([]).ids))
+
+        # Rerun after new records are created, only new records are processed
+        new_record = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(3, 5)])
+        migration_record.requeue_migration()
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 2)
+        self.assertEqual(int(migration_record.watermark_value), max(new_record.ids))
+
+        # Changing the target drops the watermark
+        migration_record.write({
+            'target_domain': "[('name', 'like', 'Chunk')]"
+        })
+        self.assertFalse(migration_record.watermark_value)
+
+        # Incremental migration is only available for batched execution
+        with self.assertRaises(ValidationError):
+            migration_record.write({
+                'execution_mode': eExecutionMode.single.name
+            })
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_19_bulk_create_migration(self):
+        # Create many migrations in a single create, every migration should
+        # get its creation date and model relation data
+        migration_records = self.DATA_MIGRATION_MODEL.create([{
+            'name': 'Test Migration 19 At Upgrade Bulk {}'.format(index),
+            'model_name': self.TEST_MODEL_NAME,
+            'migration_function': 'test_unittest_ok'
+        } for index in range(50)])
+        self.assertEqual(len(migration_records), 50)
+        self.assertTrue(all(migration_records.mapped('migration_created_date')))
+        self.assertEqual(
+            set(migration_records.mapped('model_name_relation.model')),
+            {self.TEST_MODEL_NAME})
+
+        # Cancel them as batch
+        migration_records.batch_cancel_migration()
+        self.assertEqual(
+            set(migration_records.mapped('migration_status')),
+            {eMigrationStatus.cancelled.name})
+
+    def test_20_batch_migration_rollback_failed_only(self):
+        # Run a batch where a migration fails after writing data, and another
+        # one tries to roll back, only these migrations should be rolled back
+        migration_ok = self._create_migration_at_upgrade(
+            migration_name='Test Migration 20 At Upgrade OK',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        migration_nok = self._create_migration_at_upgrade(
+            migration_name='Test Migration 20 At Upgrade Partial NOK',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_partial_nok')
+        migration_rollback = self._create_migration_at_upgrade(
+            migration_name='Test Migration 20 At Upgrade Rollback',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_rollback')
+
+        # Run the migrations as batch
+        (migration_ok | migration_nok | migration_rollback).batch_migration()
+
+        # Check migration result
+        migration_ok.invalidate_cache()
+        migration_nok.invalidate_cache()
+        migration_rollback.invalidate_cache()
+        self.assertEqual(
+            migration_ok.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(
+            migration_nok.migration_status,
+            eMigrationStatus.failed.name)
+        self.assertEqual(
+            migration_rollback.migration_status,
+            eMigrationStatus.failed.name)
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(test_record.mapped('name'), ['Test'])
+        self.assertEqual(
+            set(migration_nok.run_ids.mapped('migration_status')),
+            {eMigrationStatus.failed.name})
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_21_claimed_migration_is_not_run_twice(self):
+        # Hold the lock of a migration from another session, the migration
+        # should not run until the lock is released
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 21 At Upgrade Claimed',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        self.env.cr.commit()
+
+        with advisory_locks(self.registry, migration_record.ids) as locked_ids:
+            self.assertEqual(locked_ids, migration_record.ids)
+            with self.assertRaises(UserError):
+                migration_record.run_migration()
+            migration_record.batch_migration()
+            self.assertFalse(self.TEST_MODEL_OBJ.search([]))
+
+        # Lock is released, the migration can run
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+
+        # Migration left running without lock holder is stale after lease timeout
+        migration_record.write({
+            'migration_status': eMigrationStatus.running.name,
+            'last_run': datetime.now() - timedelta(hours=1)
+        })
+        self.assertEqual(
+            migration_record._filter_stale_running(),
+            migration_record)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_22_file_migration(self):
+        # Import a CSV file in batches, once with the migration function and once
+        # merged with migration SQL from the staging table.
+        source_file, source_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(source_file, 'w') as source_file:
+            source_file.write('name\n')
+            source_file.writelines('Imported {}\n'.format(index) for index in range(5))
+        self.addCleanup(os.remove, source_path)
+
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 22 At Upgrade File Function',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_import',
+            extra_vals={
+                'migration_type': eMigrationType.file.name,
+                'source_file_path': source_path,
+                'batch_size': 2
+            })
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 5)
+        self.assertEqual(self.TEST_MODEL_OBJ.search_count([
+            ('name', 'like', 'Imported')]), 5)
+
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 22 At Upgrade File SQL',
+            model_name=self.TEST_MODEL_NAME,
+            function_name=False,
+            extra_vals={
+                'migration_type': eMigrationType.file.name,
+                'source_file_path': source_path,
+                'migration_sql': """
+                    INSERT INTO odoo_data_migration_test (name)
+                    SELECT name || ' SQL' FROM odoo_data_migration_staging
+                """,
+                'batch_size': 2
+            })
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(self.TEST_MODEL_OBJ.search_count([
+            ('name', 'like', '% SQL')]), 5)
+
+        # File import needs a source file
+        with self.assertRaises(ValidationError):
+            self._create_migration_at_upgrade(
+                migration_name='Test Migration 22 At Upgrade File NOK',
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_import',
+                extra_vals={'migration_type': eMigrationType.file.name})
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_23_fast_mode_migration(self):
+        # Run a chunked migration in fast mode, the migration function should
+        # run without tracking and the run history should record fast mode.
+        test_records = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(3)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 23 At Upgrade Fast Mode',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_fast_mode',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2,
+                'fast_mode': True
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration result
+        migration_record.invalidate_cache()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(set(test_records.mapped('name')), {'Fast'})
+        self.assertTrue(migration_record.run_ids[0].fast_mode)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_24_managed_index_is_restored(self):
+        # Run a chunked migration managing an index, the index should be dropped
+        # during the run and rebuilt afterwards, even when the migration failed.
+        index_name = 'odoo_data_migration_test_name_migration_index'
+        self.env.cr.execute(
+            'CREATE INDEX IF NOT EXISTS {} ON odoo_data_migration_test (name)'.format(
+                index_name))
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk 0'}, {'name': 'Broken'}])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 24 At Upgrade Managed Index',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk_nok',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'batch_size': 1,
+                'index_ids': [(0, 0, {'object_name': index_name})]
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check the index is restored after the failed run
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.failed.name)
+        managed_index = migration_record.index_ids
+        self.assertFalse(managed_index.is_dropped)
+        self.assertIn('CREATE INDEX', managed_index.definition)
+        self.env.cr.execute(
+            'SELECT 1 FROM pg_indexes WHERE indexname = %s', (index_name,))
+        self.assertTrue(self.env.cr.fetchone())
+
+        # Managed indexes need a batched migration
+        with self.assertRaises(ValidationError):
+            migration_record.write({
+                'execution_mode': eExecutionMode.single.name
+            })
+
+        # Cleanup
+        self.env.cr.execute('DROP INDEX IF EXISTS {}'.format(index_name))
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_25_transient_error_is_retried(self):
+        # Run a chunked migration whose chunks fail once with a serialization
+        # failure, every chunk should be retried and the retries recorded.
+        test_records = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(4)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 25 At Upgrade Retry',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk_retry',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2,
+                'lock_timeout': 5.0
+            })
+
+        # Run the migration
+        with patch.dict(config.options, {'data_migration_retry_backoff': 0.01}):
+            migration_record.run_migration()
+
+        # Check migration result
+        migration_record.invalidate_cache()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(set(test_records.mapped('name')), {'Migrated'})
+        self.assertEqual(migration_record.last_run_retry_count, 2)
+        self.assertEqual(migration_record.run_ids[0].retry_count, 2)
+
+        # Timeouts are reset after the run
+        self.env.cr.execute('SHOW lock_timeout')
+        self.assertEqual(self.env.cr.fetchone()[0], '0')
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_26_profiled_migration(self):
+        # Run a profiled chunked migration, the run history should store the
+        # hotspots and slowest statements.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(3)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 26 At Upgrade Profile',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Chunk')]",
+                'batch_size': 2,
+                'profile': True
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check profile of the run
+        migration_record.invalidate_cache()
+        run_record = migration_record.run_ids[0]
+        self.assertEqual(run_record.migration_status, eMigrationStatus.done.name)
+        self.assertIn('Slowest SQL', run_record.profile_summary)
+        self.assertIn('odoo_data_migration_test', run_record.profile_summary)
+        self.assertTrue(run_record.profile_report)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_27_throttle_backs_off_on_active_connections(self):
+        # Keep two connections active for a while, the throttle should back off
+        # until they are done, reading fresh statistics at every check.
+        def run_active_query():
+            with self.registry.cursor() as cr:
+                cr.execute('SELECT pg_sleep(1)')
+
+        workers = [threading.Thread(target=run_active_query) for dummy in range(2)]
+        for worker in workers:
+            worker.start()
+        # Wait for the queries to be active
+        with self.registry.cursor() as cr:
+            for dummy in range(50):
+                cr.execute("""
+                    SELECT pg_stat_clear_snapshot(), count(*) FROM pg_stat_activity
+                    WHERE datname = current_database() AND query = 'SELECT pg_sleep(1)'
+                        AND state = 'active'
+                """)
+                if cr.fetchone()[1] >= 2:
+                    break
+                threading.Event().wait(0.02)
+
+        throttle = MigrationThrottle(
+            self.registry, max_active_connections=1,
+            backoff_sleep=0.1, max_backoff_sleep=0.2)
+        throttle.wait(0)
+        for worker in workers:
+            worker.join()
+
+        # Throttle backed off, then resumed once the queries were done
+        self.assertTrue(throttle.throttled_time > 0)
+
+    def test_28_incremental_write_date_migration(self):
+        # Run an incremental migration on write_date twice, the second run should
+        # skip the records written by the first run itself.
+        self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(3)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 28 At Upgrade Incremental Write Date',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'batch_size': 2,
+                'incremental': True
+            })
+        self.assertEqual(migration_record.watermark_field, 'write_date')
+
+        # Run the migration, every record is processed
+        migration_record.run_migration()
+        self.assertEqual(migration_record.processed_record_count, 3)
+
+        # Rerun without changes, records written by the first run are skipped
+        migration_record.requeue_migration()
+        migration_record.run_migration()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        self.assertEqual(migration_record.processed_record_count, 0)
+
+        # Rerun after a record is changed, only this record is processed
+        self.TEST_MODEL_OBJ.search([], limit=1).name = 'Changed'
+        migration_record.requeue_migration()
+        migration_record.run_migration()
+        self.assertEqual(migration_record.processed_record_count, 1)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_29_partition_worker_timeouts(self):
+        # Run a partitioned migration with a lock timeout, the migration function
+        # should see it on the cursor of every partition worker.
+        test_records = self.TEST_MODEL_OBJ.create([
+            {'name': 'Chunk {}'.format(index)} for index in range(4)])
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 29 At Upgrade Partition Timeouts',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_show_timeout',
+            extra_vals={
+                'execution_mode': eExecutionMode.partitioned.name,
+                'batch_size': 1,
+                'partition_count': 2,
+                'lock_timeout': 5.0
+            })
+
+        # Run the migration
+        migration_record.run_migration()
+
+        # Check migration result
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        test_records.invalidate_cache()
+        self.assertEqual(set(test_records.mapped('name')), {'5s'})
+
+        # SQL of the partition workers is measured
+        self.assertEqual(migration_record.last_run_rows_written, 4)
+        self.assertTrue(migration_record.last_run_query_count >= 4)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_30_batch_migration_commits_in_groups(self):
+        # Run a batch of single call migrations with a group size of 2, the
+        # payloads should be committed in two groups instead of one.
+        migration_records = self.DATA_MIGRATION_MODEL.browse()
+        for index in range(3):
+            migration_records |= self._create_migration_at_upgrade(
+                migration_name='Test Migration 30 At Upgrade Group {}'.format(index),
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_ok')
+
+        # Run the migrations as batch
+        migration_class = type(self.DATA_MIGRATION_MODEL)
+        with patch.dict(config.options, {'data_migration_commit_group_size': 2}), \
+                patch.object(migration_class, '_commit_migration_results', autospec=True,
+                             side_effect=migration_class._commit_migration_results) \
+                as commit_mock:
+            migration_records.batch_migration()
+
+        # Check migration result
+        migration_records.invalidate_cache()
+        self.assertEqual(
+            set(migration_records.mapped('migration_status')),
+            {eMigrationStatus.done.name})
+        self.assertEqual(
+            [len(call_args[0][1]) for call_args in commit_mock.call_args_list
+             if call_args[0][1]], [2, 1])
+        self.assertEqual(len(self.TEST_MODEL_OBJ.search([])), 3)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+from odoo.tests.common import tagged
+from odoo.tools.config import config
+
+from ..models.data_migration_model import OdooDataMigration
+from ..models.data_migration_test import OdooDataMigrationTest
+from ..utils.enum import eExecutionMode, eMigrationStatus, eMigrationType
+from ..utils.settings import get_int_option
+from .test_common import TestOdooDataMigrationCommon
+
+_logger = logging.getLogger(__name__)
+
+
+# Benchmark is excluded from standard test run, run it explicitly using
+# --test-tags test_odoo_data_migration_benchmark
+@tagged('test_odoo_data_migration_benchmark',
+        'post_install',
+        '-at_install',
+        '-standard')
+class TestOdooDataMigrationBenchmark(TestOdooDataMigrationCommon):
+    """ Benchmark of the migration engine paths. Every benchmark emits one JSON
+    line with its timing, in the log and appended to the file set in
+    `data_migration_benchmark_output` option of config file. Number of
+    synthetic rows is set using `data_migration_benchmark_rows` option.
+    """
+
+    def setUp(cls):
+        super(TestOdooDataMigrationBenchmark, cls).setUp()
+        cls.ROW_COUNT: int = get_int_option('data_migration_benchmark_rows', 10000)
+        cls.WORKER_COUNT: int = 4
+        cls.BATCH_SIZE: int = 1000
+
+    def tearDown(cls):
+        cls.TEST_MODEL_OBJ.cleanup_data()
+        super(TestOdooDataMigrationBenchmark, cls).tearDown()
+
+    def _emit_result(
+            cls,
+            benchmark_name: str,
+            duration: float,
+            row_count: int,
+            migration_records: OdooDataMigration):
+        migration_records.invalidate_cache()
+        result = {
+            'benchmark': benchmark_name,
+            'version': cls.env['ir.module.module'].search(
+                [('name', '=', 'odoo_data_migration')]).latest_version,
+            'date': datetime.now().isoformat(),
+            'rows': row_count,
+            'migrations': len(migration_records),
+            'duration': duration,
+            'rows_per_second': row_count / duration if duration else 0.0,
+            'query_count': sum(migration_records.mapped('last_run_query_count')),
+            'rows_written': sum(migration_records.mapped('last_run_rows_written')),
+        }
+        result_line = json.dumps(result, sort_keys=True)
+        _logger.info('BENCHMARK RESULT: %s', result_line)
+        output_path = config.get('data_migration_benchmark_output')
+        if output_path:
+            with open(output_path, 'a') as output_file:
+                output_file.write(result_line + '\n')
+        return result
+
+    def _create_benchmark_records(cls) -> OdooDataMigrationTest:
+        # Synthetic rows, only created by the benchmarks migrating them
+        return cls.TEST_MODEL_OBJ.create([
+            {'name': 'Benchmark {}'.format(index)} for index in range(cls.ROW_COUNT)])
+
+    def _create_range_migrations(
+            cls,
+            benchmark_name: str,
+            test_records: OdooDataMigrationTest) -> OdooDataMigration:
+        # Split test records into one chunked migration per worker
+        migration_records = cls.DATA_MIGRATION_MODEL.browse()
+        range_size = -(-len(test_records) // cls.WORKER_COUNT)
+        for index in range(cls.WORKER_COUNT):
+            range_records = test_records[index * range_size:(index + 1) * range_size]
+            migration_records |= cls._create_migration_at_upgrade(
+                migration_name='{} {}'.format(benchmark_name, index),
+                model_name=cls.TEST_MODEL_NAME,
+                function_name='test_unittest_chunk',
+                extra_vals={
+                    'execution_mode': eExecutionMode.chunked.name,
+                    'target_domain': str([('id', 'in', range_records.ids)]),
+                    'batch_size': cls.BATCH_SIZE
+                })
+        return migration_records
+
+    def _trigger_migration_upgrade(cls, worker_count: int):
+        # Run queued migrations the way a module upgrade does
+        with patch.dict(config.options, {'data_migration_workers': worker_count}):
+            cls.DATA_MIGRATION_MODEL.trigger_migration_upgrade()
+
+    def _assert_done(cls, migration_records: OdooDataMigration):
+        migration_records.invalidate_cache()
+        cls.assertEqual(
+            set(migration_records.mapped('migration_status')),
+            {eMigrationStatus.done.name})
+
+    def test_1_benchmark_sequential_migration(self):
+        migration_records = self._create_range_migrations(
+            'Benchmark Sequential', self._create_benchmark_records())
+        start_time = time.perf_counter()
+        self._trigger_migration_upgrade(worker_count=1)
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_records)
+        self._emit_result('sequential', duration, self.ROW_COUNT, migration_records)
+
+    def test_2_benchmark_parallel_migration(self):
+        migration_records = self._create_range_migrations(
+            'Benchmark Parallel', self._create_benchmark_records())
+        start_time = time.perf_counter()
+        self._trigger_migration_upgrade(worker_count=self.WORKER_COUNT)
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_records)
+        self._emit_result('parallel', duration, self.ROW_COUNT, migration_records)
+
+    def test_3_benchmark_chunked_migration(self):
+        self._create_benchmark_records()
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Benchmark Chunked',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.chunked.name,
+                'target_domain': "[('name', 'like', 'Benchmark')]",
+                'batch_size': self.BATCH_SIZE
+            })
+        start_time = time.perf_counter()
+        migration_record.run_migration()
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_record)
+        self._emit_result('chunked', duration, self.ROW_COUNT, migration_record)
+
+    def test_4_benchmark_partitioned_migration(self):
+        self._create_benchmark_records()
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Benchmark Partitioned',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_chunk',
+            extra_vals={
+                'execution_mode': eExecutionMode.partitioned.name,
+                'target_domain': "[('name', 'like', 'Benchmark')]",
+                'batch_size': self.BATCH_SIZE,
+                'partition_count': self.WORKER_COUNT
+            })
+        start_time = time.perf_counter()
+        migration_record.run_migration()
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_record)
+        self._emit_result('partitioned', duration, self.ROW_COUNT, migration_record)
+
+    def test_5_benchmark_cron_dispatch(self):
+        # Measure dispatcher overhead using migrations that do nothing
+        migration_records = self.DATA_MIGRATION_MODEL.browse()
+        scheduled_running_time = datetime.now() - relativedelta(minutes=1)
+        for index in range(self.WORKER_COUNT * 5):
+            migration_records |= self._create_migration_with_cron(
+                migration_name='Benchmark Cron Dispatch {}'.format(index),
+                model_name=self.TEST_MODEL_NAME,
+                function_name='test_unittest_noop',
+                scheduled_running_time=scheduled_running_time)
+        start_time = time.perf_counter()
+        self.DATA_MIGRATION_MODEL._cron_dispatch_migration(limit=len(migration_records))
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_records)
+        self._emit_result('cron_dispatch', duration, 0, migration_records)
+
+    def test_6_benchmark_sql_migration(self):
+        self._create_benchmark_records()
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Benchmark SQL',
+            model_name=self.TEST_MODEL_NAME,
+            function_name=False,
+            extra_vals={
+                'migration_type': eMigrationType.sql.name,
+                'migration_sql': """
+                    UPDATE odoo_data_migration_test SET name = 'Migrated'
+                    WHERE id BETWEEN %(min_id)s AND %(max_id)s
+                        AND name LIKE 'Benchmark%%'
+                """,
+                'sql_invalidate_fields': 'name',
+                'batch_size': self.BATCH_SIZE
+            })
+        start_time = time.perf_counter()
+        migration_record.run_migration()
+        duration = time.perf_counter() - start_time
+        self._assert_done(migration_record)
+        self._emit_result('sql', duration, self.ROW_COUNT, migration_record)
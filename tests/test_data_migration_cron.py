@@ -6,7 +6,6 @@ from dateutil.relativedelta import relativedelta
 from odoo.tests.common import tagged
 from odoo.tools.config import config
 
-from ...base.models.ir_actions import IrActionsServer
 from ...base.models.ir_cron import ir_cron
 from ..models.reschedule_wizard import RescheduleMigrationWizard
 from ..utils.enum import eMigrationStatus, eRunningMethod
@@ -24,33 +23,30 @@ class TestOdooDataMigrationCron(TestOdooDataMigrationCommon):
             'reschedule.migration.wizard']
 
     def test_1_create_and_run_migration_cron_ok(self):
-        # Create a migration record
+        # Create a migration record that is already due
         migration_name = 'Test Migration 1 Cron'
-        scheduled_running_time = datetime.now() + relativedelta(minutes=1)
+        scheduled_running_time = datetime.now() - relativedelta(minutes=1)
         migration_record = self._create_migration_with_cron(
             migration_name=migration_name,
             model_name=self.TEST_MODEL_NAME,
             function_name='test_unittest_ok',
             scheduled_running_time=scheduled_running_time)
 
-        # Check the created record, should have ir_cron_record
+        # Check the dispatcher cron, every scheduled migration should be run
+        # by it instead of its own ir_cron record
         self.assertIsNotNone(migration_record)
-        self.assertIsNotNone(migration_record.ir_cron_reference)
-        ir_cron_ref: ir_cron = migration_record.ir_cron_reference
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.queued.name)
+        ir_cron_ref: ir_cron = self.env.ref(
+            'odoo_data_migration.ir_cron_dispatch_data_migration')
         self.assertEqual(ir_cron_ref.active, True)
-        self.assertEqual(ir_cron_ref.numbercall, 1)
-        self.assertEqual(ir_cron_ref.cron_name,
-                         'Scheduled Migration - {}'.format(migration_name))
-        self.assertEqual(ir_cron_ref.nextcall, scheduled_running_time)
-
-        ir_cron_action_ref: IrActionsServer = ir_cron_ref.ir_actions_server_id
         self.assertEqual(
             ir_cron_ref.model_id.model,
             self.DATA_MIGRATION_MODEL._name)
         self.assertEqual(
-            ir_cron_action_ref.code,
-            "rec = env['odoo.data.migration'].browse({}).run_migration()".format(
-                migration_record.id))
+            ir_cron_ref.ir_actions_server_id.code,
+            'model._cron_dispatch_migration()')
 
         # Try to run the cron by immediately trigger run cron, due to we can't
         # wait cron to run
@@ -58,31 +54,29 @@ class TestOdooDataMigrationCron(TestOdooDataMigrationCommon):
 
         # Validate migration result
         # This sample migration should create a new record in test model
+        migration_record.invalidate_cache()
         self.assertEqual(
             migration_record.migration_status,
             eMigrationStatus.done.name)
-        test_record = self.TEST_MODEL_OBJ.search([])
-        self.assertEqual(len(test_record), 1)
-        self.assertEqual(test_record.name, 'Test')
+        test_record = self.TEST_MODEL_OBJ.search([('name', '=', 'Test')])
+        self.assertTrue(test_record)
 
         # Cleanup
         self.TEST_MODEL_OBJ.cleanup_data()
 
     def test_2_change_at_upgrade_to_cron_migration(self):
         # First, create a migration using running_method at_upgrade, then change it to cron_job.
-        # Initially, it won't have ir_cron_record, so we need to add
-        # ir_cron_record first.
         migration_name = 'Test Migration 2 At Upgrade to Cron'
         initial_migration_record = self._create_migration_at_upgrade(
             migration_name=migration_name,
             model_name=self.TEST_MODEL_NAME,
             function_name='test_unittest_ok')
         self.assertIsNotNone(initial_migration_record)
-        self.assertFalse(initial_migration_record.ir_cron_reference)
         self.assertFalse(initial_migration_record.scheduled_running_time)
 
-        # Then, change it to cron job. It should be now have ir_cron reference
-        scheduled_running_time = datetime.now() + relativedelta(minutes=10)
+        # Then, change it to cron job.
+        scheduled_running_time = (
+            datetime.now() + relativedelta(minutes=10)).replace(microsecond=0)
         # Pass the timezone context so that it won't be reconverted again since
         # datetime.now() output in utc
         initial_migration_record.with_context(tz=config.get('timezone') or 'UTC').write({
@@ -90,92 +84,73 @@ class TestOdooDataMigrationCron(TestOdooDataMigrationCommon):
             'scheduled_running_time': scheduled_running_time
         })
 
-        # Check result
-        self.assertIsNotNone(initial_migration_record.ir_cron_reference)
-        ir_cron_ref: ir_cron = initial_migration_record.ir_cron_reference
-        self.assertEqual(ir_cron_ref.active, True)
-        self.assertEqual(ir_cron_ref.numbercall, 1)
-        self.assertEqual(ir_cron_ref.cron_name,
-                         'Scheduled Migration - {}'.format(migration_name))
-        self.assertEqual(ir_cron_ref.nextcall, scheduled_running_time)
-
-        ir_cron_action_ref: IrActionsServer = ir_cron_ref.ir_actions_server_id
+        # Dispatch scheduled migration, it's not due yet so it should be kept
+        # in queue
+        self.DATA_MIGRATION_MODEL._cron_dispatch_migration()
+        initial_migration_record.invalidate_cache()
         self.assertEqual(
-            ir_cron_ref.model_id.model,
-            self.DATA_MIGRATION_MODEL._name)
+            initial_migration_record.migration_status,
+            eMigrationStatus.queued.name)
         self.assertEqual(
-            ir_cron_action_ref.code,
-            "rec = env['odoo.data.migration'].browse({}).run_migration()".format(
-                initial_migration_record.id))
+            initial_migration_record.scheduled_running_time,
+            scheduled_running_time)
 
         # Cleanup
         self.TEST_MODEL_OBJ.cleanup_data()
 
     def test_3_reschedule_cron_migration(self):
-        # First create a migration using running_method cron_job. Then reschedule it, the nextcall
-        # should be follow the rescheduled time
-        # Create a migration record
+        # First run a due cron_job migration. Then reschedule it, it should be
+        # requeued with the rescheduled time.
         migration_name = 'Test Migration 3 Reschedule Cron'
-        scheduled_running_time = datetime.now() + relativedelta(minutes=1)
+        scheduled_running_time = datetime.now() - relativedelta(minutes=1)
         migration_record = self._create_migration_with_cron(
             migration_name=migration_name,
             model_name=self.TEST_MODEL_NAME,
             function_name='test_unittest_ok',
             scheduled_running_time=scheduled_running_time)
-
-        # Check the created record, should have ir_cron_record
-        self.assertIsNotNone(migration_record)
-        self.assertIsNotNone(migration_record.ir_cron_reference)
-        ir_cron_ref: ir_cron = migration_record.ir_cron_reference
-        self.assertEqual(ir_cron_ref.active, True)
-        self.assertEqual(ir_cron_ref.numbercall, 1)
-        self.assertEqual(ir_cron_ref.cron_name,
-                         'Scheduled Migration - {}'.format(migration_name))
-        self.assertEqual(ir_cron_ref.nextcall, scheduled_running_time)
+        self.DATA_MIGRATION_MODEL._cron_dispatch_migration()
+        migration_record.invalidate_cache()
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
 
         # Now, try to reschedule it
-        new_scheduled_running_time = datetime.now() + relativedelta(minutes=10)
-        reschedule_wizard = self.RESCHEDULE_WIZARD_MODEL.create({
+        new_scheduled_running_time = (
+            datetime.now() + relativedelta(minutes=10)).replace(microsecond=0)
+        self.RESCHEDULE_WIZARD_MODEL.create({
             'data_migration_record': migration_record.id,
             'rescheduled_time': new_scheduled_running_time
         }).reschedule_cron()
 
         # Validate rescheduling result
-        ir_cron_ref: ir_cron = migration_record.ir_cron_reference
-        self.assertEqual(ir_cron_ref.active, True)
-        self.assertEqual(ir_cron_ref.numbercall, 1)
-        self.assertEqual(ir_cron_ref.nextcall, new_scheduled_running_time)
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.queued.name)
+        self.assertEqual(
+            migration_record.scheduled_running_time,
+            new_scheduled_running_time)
 
         # Cleanup
         self.TEST_MODEL_OBJ.cleanup_data()
 
     def test_4_cancel_cron_migration(self):
-        # First, create a cron migration. Then try to cancel it.
-        # When succeded, it should deactivate cron job record.
-        # Create a migration record
-        migration_name = 'Test Migration 3 Reschedule Cron'
-        scheduled_running_time = datetime.now() + relativedelta(minutes=1)
+        # First, create a due cron migration. Then try to cancel it.
+        # When succeded, dispatcher cron should not run it.
+        migration_name = 'Test Migration 4 Cancel Cron'
+        scheduled_running_time = datetime.now() - relativedelta(minutes=1)
         migration_record = self._create_migration_with_cron(
             migration_name=migration_name,
             model_name=self.TEST_MODEL_NAME,
             function_name='test_unittest_ok',
             scheduled_running_time=scheduled_running_time)
 
-        # Check the created record, should have ir_cron_record
-        self.assertIsNotNone(migration_record)
-        self.assertIsNotNone(migration_record.ir_cron_reference)
-        ir_cron_ref: ir_cron = migration_record.ir_cron_reference
-        self.assertEqual(ir_cron_ref.active, True)
-        self.assertEqual(ir_cron_ref.numbercall, 1)
-        self.assertEqual(ir_cron_ref.cron_name,
-                         'Scheduled Migration - {}'.format(migration_name))
-        self.assertEqual(ir_cron_ref.nextcall, scheduled_running_time)
-
         # Then, try to cancel it.
         migration_record.cancel_migration()
+        self.DATA_MIGRATION_MODEL._cron_dispatch_migration()
 
         # Validate result
+        migration_record.invalidate_cache()
         self.assertEqual(
             migration_record.migration_status,
             eMigrationStatus.cancelled.name)
-        self.assertEqual(ir_cron_ref.active, False)
+        self.assertFalse(migration_record.last_run)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import tagged
+
+from ..models.data_migration_job import OdooDataMigrationJob
+from ..utils.enum import eMigrationStatus
+from .test_common import TestOdooDataMigrationCommon
+
+
+@tagged('test_odoo_data_migration',
+        'test_odoo_data_migration_job',
+        'post_install',
+        '-at_install')
+class TestOdooDataMigrationJob(TestOdooDataMigrationCommon):
+    def setUp(cls):
+        super(TestOdooDataMigrationJob, cls).setUp()
+        cls.JOB_MODEL: OdooDataMigrationJob = cls.env['odoo.data.migration.job']
+        # Cleanup jobs, job runner takes the oldest job of the whole queue
+        cls.JOB_MODEL.search([]).unlink()
+
+    def test_1_enqueue_and_run_migration_job(self):
+        # Enqueue a migration twice, only one job should be queued
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 1 Job',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        job_record = migration_record.enqueue_migration()
+        self.assertEqual(len(job_record), 1)
+        self.assertFalse(migration_record.enqueue_migration())
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.queued.name)
+
+        # Take and run the job like the job runner
+        acquired_job = self.JOB_MODEL._acquire_job()
+        self.assertEqual(acquired_job, job_record)
+        self.assertEqual(acquired_job.job_status, eMigrationStatus.running.name)
+        self.assertFalse(self.JOB_MODEL._acquire_job())
+        acquired_job.run_job()
+
+        # Check job and migration result
+        self.assertEqual(job_record.job_status, eMigrationStatus.done.name)
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.done.name)
+        test_record = self.TEST_MODEL_OBJ.search([])
+        self.assertEqual(len(test_record), 1)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_2_migration_job_follows_dependency(self):
+        # Enqueue a migration and its dependency, the dependency job should be
+        # taken first, and the dependent job skipped when the dependency fails
+        dependency_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 2 Job Dependency',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_nok')
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 2 Job Dependent',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok',
+            extra_vals={
+                'dependency_ids': [(6, 0, dependency_record.ids)]
+            })
+        job_record = (migration_record | dependency_record).enqueue_migration()
+        self.assertEqual(len(job_record), 2)
+
+        # Run the dependency job
+        acquired_job = self.JOB_MODEL._acquire_job()
+        self.assertEqual(acquired_job.migration_id, dependency_record)
+        acquired_job.run_job()
+        self.assertEqual(acquired_job.job_status, eMigrationStatus.failed.name)
+
+        # The dependent job can't run anymore
+        self.assertFalse(self.JOB_MODEL._acquire_job())
+        dependent_job = job_record - acquired_job
+        dependent_job.invalidate_cache()
+        self.assertEqual(dependent_job.job_status, eMigrationStatus.failed.name)
+        self.assertEqual(
+            migration_record.migration_status,
+            eMigrationStatus.queued.name)
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
+
+    def test_3_cancelled_migration_job_is_not_run(self):
+        # Cancel a migration whose job is queued, the job should be cancelled
+        # and never taken by the job runner
+        migration_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 3 Job Cancelled',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        job_record = migration_record.enqueue_migration()
+        migration_record.cancel_migration()
+        self.assertEqual(job_record.job_status, eMigrationStatus.cancelled.name)
+        self.assertFalse(self.JOB_MODEL._acquire_job())
+
+        # Job of a migration cancelled without cancelling its jobs is not taken
+        other_record = self._create_migration_at_upgrade(
+            migration_name='Test Migration 3 Job Cancelled Status',
+            model_name=self.TEST_MODEL_NAME,
+            function_name='test_unittest_ok')
+        other_job = other_record.enqueue_migration()
+        other_record.write({
+            'migration_status': eMigrationStatus.cancelled.name
+        })
+        self.assertFalse(self.JOB_MODEL._acquire_job())
+        other_job.invalidate_cache()
+        self.assertEqual(other_job.job_status, eMigrationStatus.queued.name)
+        self.assertFalse(self.TEST_MODEL_OBJ.search([]))
+
+        # Cleanup
+        self.TEST_MODEL_OBJ.cleanup_data()
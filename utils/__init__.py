@@ -1,2 +1,11 @@
 from . import enum
 from . import timezone_convert
+from . import settings
+from . import dag
+from . import instrumentation
+from . import dry_run
+from . import throttle
+from . import lock
+from . import file_source
+from . import retry
+from . import profiler
@@ -0,0 +1,22 @@
+def topological_layers(graph):
+    """ Group nodes of a dependency graph into layers. Graph maps every node to
+    the nodes it depends on, dependencies outside the graph are ignored. Every
+    node only depends on nodes of previous layers, and nodes keep the graph
+    order inside a layer. Raise ValueError with the nodes left in a cycle.
+    """
+    remaining = {
+        node: set(dependencies) & set(graph)
+        for node, dependencies in graph.items()
+    }
+    layers = []
+    while remaining:
+        layer = [node for node, dependencies in remaining.items()
+                 if not dependencies]
+        if not layer:
+            raise ValueError(list(remaining))
+        layers.append(layer)
+        for node in layer:
+            remaining.pop(node)
+        for dependencies in remaining.values():
+            dependencies.difference_update(layer)
+    return layers
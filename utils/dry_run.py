@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from odoo.exceptions import UserError
+
+
+class DryRunRollback(Exception):
+    """ Raised at the end of a dry run to roll back its savepoint. """
+
+
+@contextmanager
+def prevent_commit(cr, message='Migration can not commit or roll back during dry run.'):
+    """ Make commit and rollback of the cursor raise UserError with message
+    inside the block, so work done during a dry run, or inside a savepoint, can't
+    escape it, and work done before the block can't be discarded by it.
+    """
+    previous_methods = {
+        method: cr.__dict__.get(method) for method in ('commit', 'rollback')}
+
+    def prevented():
+        raise UserError(message)
+
+    cr.commit = prevented
+    cr.rollback = prevented
+    try:
+        yield cr
+    finally:
+        for method, previous_method in previous_methods.items():
+            if previous_method:
+                setattr(cr, method, previous_method)
+            else:
+                delattr(cr, method)
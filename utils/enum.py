@@ -12,3 +12,26 @@ class eMigrationStatus(str, Enum):
 class eRunningMethod(str, Enum):
     at_upgrade = auto()
     cron_job = auto()
+
+
+class eExecutionMode(str, Enum):
+    single = auto()
+    chunked = auto()
+    partitioned = auto()
+
+
+class eMigrationType(str, Enum):
+    function = auto()
+    sql = auto()
+    file = auto()
+
+
+class eFileFormat(str, Enum):
+    csv = auto()
+    jsonl = auto()
+
+
+class eTableObjectType(str, Enum):
+    index = auto()
+    constraint = auto()
+    trigger = auto()
@@ -0,0 +1,54 @@
+import csv
+import io
+import itertools
+
+# Temporary table receiving every batch of a file migration. It is created per
+# session, and emptied on every commit.
+STAGING_TABLE = 'odoo_data_migration_staging'
+
+
+def _iter_records(source_file, file_format):
+    """ Yield every record of the source file as a list of values. JSONL record
+    is kept as a single JSON value.
+    """
+    if file_format == 'csv':
+        reader = csv.reader(source_file)
+        # Header is read by read_columns
+        next(reader, None)
+        return (row for row in reader if row)
+    return ([line.rstrip('\r\n')] for line in source_file if line.strip())
+
+
+def read_columns(path, file_format):
+    """ Return staging table columns of the source file: header of CSV file, or
+    a single data column holding every JSONL record.
+    """
+    if file_format != 'csv':
+        return ['data']
+    with open(path, newline='', encoding='utf-8') as source_file:
+        return [column.strip() for column in next(csv.reader(source_file), [])]
+
+
+def count_records(path, file_format):
+    """ Return the number of records of the source file. """
+    with open(path, newline='', encoding='utf-8') as source_file:
+        return sum(1 for record in _iter_records(source_file, file_format))
+
+
+def iter_copy_batches(path, file_format, batch_size, skip_count=0):
+    """ Yield tuple of CSV buffer ready to be loaded with COPY and its record
+    count, for every batch_size records of the source file after skip_count
+    records. Only one batch is kept in memory at a time.
+    """
+    with open(path, newline='', encoding='utf-8') as source_file:
+        records = _iter_records(source_file, file_format)
+        if skip_count:
+            next(itertools.islice(records, skip_count, skip_count), None)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            yield buffer, len(batch)
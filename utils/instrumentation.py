@@ -0,0 +1,79 @@
+import re
+import resource
+import time
+
+# Table written by an INSERT, UPDATE or DELETE statement
+WRITE_STATEMENT_RE = re.compile(
+    r'^\s*(?:insert\s+into|update|delete\s+from)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+class MigrationMetrics(object):
+    """ Context manager measuring a migration run on a cursor. Collect wall time,
+    cpu time of the current thread, number and time of sql statements executed
+    on the cursor, rows written by INSERT, UPDATE and DELETE statements on
+    tables other than ignored_tables, and growth of the peak resident memory of
+    the process in MB during the run.
+
+    Metrics of worker threads running part of the run on their own cursor are
+    added with add(). Peak memory only grows when the run goes over the highest
+    peak of the process so far, so a run lighter than a previous one in the
+    same process reports 0.
+    """
+
+    def __init__(self, cr, ignored_tables=()):
+        self.cr = cr
+        self.ignored_tables = set(ignored_tables)
+        self.duration = 0.0
+        self.cpu_time = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.rows_written = 0
+        self.memory_peak = 0.0
+
+    def __enter__(self):
+        # Wrap execute of this cursor instance only, previous instance level
+        # wrapper is restored on exit so metrics can be nested.
+        self._previous_execute = self.cr.__dict__.get('execute')
+        original_execute = self.cr.execute
+
+        def execute(query, *args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                result = original_execute(query, *args, **kwargs)
+            finally:
+                self.query_count += 1
+                self.query_time += time.perf_counter() - start_time
+            match = WRITE_STATEMENT_RE.match(query) if isinstance(query, str) else None
+            if match and match.group(1) not in self.ignored_tables:
+                self.rows_written += max(self.cr.rowcount, 0)
+            return result
+
+        self.cr.execute = execute
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = time.thread_time()
+        self._start_memory_peak = self._get_memory_peak()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.duration = time.perf_counter() - self._start_time
+        self.cpu_time += time.thread_time() - self._start_cpu_time
+        self.memory_peak = self._get_memory_peak() - self._start_memory_peak
+        if self._previous_execute:
+            self.cr.execute = self._previous_execute
+        else:
+            del self.cr.execute
+        return False
+
+    def add(self, metrics):
+        """ Add cpu time, sql statements and rows written of metrics, measured on
+        a worker thread and cursor, to this run.
+        """
+        self.cpu_time += metrics.cpu_time
+        self.query_count += metrics.query_count
+        self.query_time += metrics.query_time
+        self.rows_written += metrics.rows_written
+
+    @staticmethod
+    def _get_memory_peak():
+        """ Return peak resident memory of the process since it started, in MB. """
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+# First key of the advisory locks taken on migration ids, the second key is the
+# migration id. Must stay a positive int4 to be compared with pg_locks.classid.
+MIGRATION_LOCK_KEY = 1296647506
+
+
+@contextmanager
+def advisory_locks(registry, object_ids, key=MIGRATION_LOCK_KEY):
+    """ Hold PostgreSQL session advisory locks on object_ids in a dedicated
+    cursor for the duration of the block. Yield list of object ids whose lock was
+    acquired, locks already held by another session are skipped. Locks are
+    released on exit, or by PostgreSQL when the session of a crashed worker ends.
+    """
+    if not object_ids:
+        yield []
+        return
+
+    with registry.cursor() as cr:
+        cr.execute("""
+            SELECT object_id FROM unnest(%s) AS object_id
+            WHERE pg_try_advisory_lock(%s, object_id)
+        """, (list(object_ids), key))
+        locked_ids = [row[0] for row in cr.fetchall()]
+        # Session locks outlive the transaction, don't keep it open
+        cr.commit()
+        try:
+            yield locked_ids
+        finally:
+            if locked_ids:
+                cr.execute("""
+                    SELECT pg_advisory_unlock(%s, object_id)
+                    FROM unnest(%s) AS object_id
+                """, (key, locked_ids))
+
+
+def lock_held_condition(id_column, key=MIGRATION_LOCK_KEY):
+    """ Return SQL condition, true when the advisory lock on id_column is held
+    by any session of the current database. Advisory locks are cluster wide,
+    pg_locks lists the locks of every database of the cluster.
+    """
+    return """EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory' AND classid = {} AND objid = {} AND objsubid = 2
+            AND granted
+            AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+    )""".format(int(key), id_column)
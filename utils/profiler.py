@@ -0,0 +1,119 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Hotspots and statements listed in the summary, the report lists top_count
+SUMMARY_COUNT = 5
+
+
+class MigrationProfiler(object):
+    """ Context manager profiling a migration run on a cursor. Python functions
+    of the current thread are profiled with cProfile, and every sql statement
+    executed on the cursor is timed, grouped by statement text. On exit, report
+    holds the top_count hotspots and slowest statements, summary the first of
+    them.
+    """
+
+    def __init__(self, cr, top_count=20):
+        self.cr = cr
+        self.top_count = top_count
+        self.profile = cProfile.Profile()
+        self.query_stats = {}
+        self.report = ''
+        self.summary = ''
+        self._is_profile_enabled = False
+
+    def __enter__(self):
+        # Wrap execute of this cursor instance only, like MigrationMetrics
+        self._previous_execute = self.cr.__dict__.get('execute')
+        original_execute = self.cr.execute
+
+        def execute(query, *args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return original_execute(query, *args, **kwargs)
+            finally:
+                self._add_query(query, time.perf_counter() - start_time)
+
+        self.cr.execute = execute
+        try:
+            self.profile.enable()
+            self._is_profile_enabled = True
+        except ValueError:
+            # Another profiler is already running in this thread
+            _logger.warning('Python profiler is not available, only SQL is profiled.')
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if self._is_profile_enabled:
+            self.profile.disable()
+        if self._previous_execute:
+            self.cr.execute = self._previous_execute
+        else:
+            del self.cr.execute
+        self.report = self._get_report()
+        self.summary = self._get_summary()
+        return False
+
+    def _add_query(self, query, duration):
+        """ Add duration of a statement to the statistics of its text. """
+        query = str(query)
+        count, total_time, max_time = self.query_stats.get(query, (0, 0.0, 0.0))
+        self.query_stats[query] = (
+            count + 1, total_time + duration, max(max_time, duration))
+
+    def _get_slowest_queries(self, count):
+        """ Return list of tuple of statement text, call count, total and max
+        time, by descending total time.
+        """
+        return sorted(
+            ((query,) + stats for query, stats in self.query_stats.items()),
+            key=lambda stats: stats[2], reverse=True)[:count]
+
+    def _get_hotspots(self, count):
+        """ Return list of tuple of function name, call count, internal time and
+        cumulative time, by descending internal time.
+        """
+        if not self._is_profile_enabled:
+            return []
+        stats = pstats.Stats(self.profile).stats
+        return sorted((
+            ('{}:{}({})'.format(filename, line, function), call_count,
+             internal_time, cumulative_time)
+            for (filename, line, function), (
+                dummy, call_count, internal_time, cumulative_time, dummy_callers)
+            in stats.items()), key=lambda hotspot: hotspot[2], reverse=True)[:count]
+
+    def _get_report(self):
+        """ Return full text report: pstats listing of the hotspots by
+        cumulative and internal time, then the slowest statements.
+        """
+        report = io.StringIO()
+        if self._is_profile_enabled:
+            for sort_key in ('cumulative', 'tottime'):
+                report.write('PYTHON HOTSPOTS BY {} TIME\n'.format(sort_key.upper()))
+                pstats.Stats(self.profile, stream=report).sort_stats(
+                    sort_key).print_stats(self.top_count)
+        report.write('SLOWEST SQL STATEMENTS\n')
+        for query, count, total_time, max_time in self._get_slowest_queries(
+                self.top_count):
+            report.write('\n{:.3f}s total, {} calls, {:.3f}s max\n{}\n'.format(
+                total_time, count, max_time, query.strip()))
+        return report.getvalue()
+
+    def _get_summary(self):
+        """ Return short text listing the first hotspots and slowest statements. """
+        lines = ['Python hotspots (internal time):']
+        lines += ['{:.3f}s {} calls {}'.format(internal_time, count, function)
+                  for function, count, internal_time, dummy
+                  in self._get_hotspots(SUMMARY_COUNT)]
+        lines.append('Slowest SQL (total time):')
+        lines += ['{:.3f}s {} calls {}'.format(
+            total_time, count, ' '.join(query.split())[:200])
+            for query, count, total_time, dummy
+            in self._get_slowest_queries(SUMMARY_COUNT)]
+        return '\n'.join(lines)
@@ -0,0 +1,68 @@
+import logging
+import random
+import time
+
+import psycopg2
+from psycopg2 import errorcodes
+
+_logger = logging.getLogger(__name__)
+
+# Errors caused by concurrent transactions, the failed transaction can be run
+# again as is
+TRANSIENT_PGCODES = (
+    errorcodes.DEADLOCK_DETECTED,
+    errorcodes.SERIALIZATION_FAILURE,
+    errorcodes.LOCK_NOT_AVAILABLE,
+)
+
+
+def is_transient_error(error):
+    """ Return True if error is a transient PostgreSQL error: deadlock,
+    serialization failure or lock not available, raised by lock_timeout.
+    """
+    return isinstance(error, psycopg2.Error) and error.pgcode in TRANSIENT_PGCODES
+
+
+class MigrationRetry(object):
+    """ Run a batch of a migration again when it fails on a transient PostgreSQL
+    error. The batch must commit its own work, the failed transaction is rolled
+    back before the next attempt. Retry sleeps grow exponentially from
+    backoff_sleep up to max_backoff_sleep, with random jitter so concurrent
+    workers don't collide again. on_retry is called after every rollback.
+    """
+
+    def __init__(self, cr, max_retries=3, backoff_sleep=1.0, max_backoff_sleep=60.0,
+                 on_retry=None):
+        self.cr = cr
+        self.max_retries = max_retries
+        self.backoff_sleep = backoff_sleep
+        self.max_backoff_sleep = max_backoff_sleep
+        self.on_retry = on_retry
+        self.retry_count = 0
+
+    def run(self, function, *args, **kwargs):
+        """ Call function with args until it succeeds, a non transient error is
+        raised, or max_retries retries failed. Return the function result.
+        """
+        attempt = 0
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except psycopg2.Error as e:
+                if not is_transient_error(e) or attempt >= self.max_retries:
+                    raise
+                self.cr.rollback()
+                attempt += 1
+                self.retry_count += 1
+                if self.on_retry:
+                    self.on_retry()
+                sleep_time = self._get_sleep_time(attempt)
+                _logger.warning(
+                    'Transient database error {}, retry {}/{} in {:.2f}s.'.format(
+                        e.pgcode, attempt, self.max_retries, sleep_time))
+                time.sleep(sleep_time)
+
+    def _get_sleep_time(self, attempt):
+        """ Return sleep time before retry number attempt, half of it is random. """
+        sleep_time = min(self.backoff_sleep * 2 ** (attempt - 1), self.max_backoff_sleep)
+        return sleep_time / 2 + random.uniform(0, sleep_time / 2)
@@ -0,0 +1,25 @@
+from odoo.tools.config import config
+
+
+def get_int_option(key, default):
+    """ Return integer option from odoo config file, or default if not set. """
+    try:
+        return int(config.get(key) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_float_option(key, default):
+    """ Return float option from odoo config file, or default if not set. """
+    try:
+        return float(config.get(key) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_bool_option(key, default):
+    """ Return boolean option from odoo config file, or default if not set. """
+    value = config.get(key)
+    if value in (None, ''):
+        return default
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,93 @@
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class MigrationThrottle(object):
+    """ Slow down a migration between its batches so it doesn't starve other
+    database users. Each limit is disabled when set to 0.
+
+    - max_rows_per_second: sleep until the processed rows fit the rate.
+    - batch_sleep: fixed sleep in seconds after every batch.
+    - max_active_connections: back off while more connections are active on the
+      database, read from pg_stat_activity.
+    - max_replication_lag: back off while a replica replays more than this many
+      seconds late, read from pg_stat_replication.
+
+    Back off sleeps grow exponentially from backoff_sleep up to max_backoff_sleep.
+    Statistics are read on a short-lived cursor of registry, PostgreSQL keeps
+    them frozen for the whole transaction of the migration cursor.
+    """
+
+    def __init__(self, registry, max_rows_per_second=0.0, batch_sleep=0.0,
+                 max_active_connections=0, max_replication_lag=0.0,
+                 backoff_sleep=1.0, max_backoff_sleep=60.0):
+        self.registry = registry
+        self.max_rows_per_second = max_rows_per_second
+        self.batch_sleep = batch_sleep
+        self.max_active_connections = max_active_connections
+        self.max_replication_lag = max_replication_lag
+        self.backoff_sleep = backoff_sleep
+        self.max_backoff_sleep = max_backoff_sleep
+        self.throttled_time = 0.0
+        self._row_count = 0
+        self._start_time = time.perf_counter()
+
+    def wait(self, row_count):
+        """ Sleep as long as needed after a batch of row_count rows. """
+        self._row_count += row_count
+        if self.batch_sleep:
+            self._sleep(self.batch_sleep)
+
+        if self.max_rows_per_second:
+            elapsed = time.perf_counter() - self._start_time
+            self._sleep(self._row_count / self.max_rows_per_second - elapsed)
+
+        backoff_sleep = self.backoff_sleep
+        while self._is_database_overloaded():
+            self._sleep(backoff_sleep)
+            backoff_sleep = min(backoff_sleep * 2, self.max_backoff_sleep)
+
+    def _is_database_overloaded(self):
+        if not self.max_active_connections and not self.max_replication_lag:
+            return False
+        with self.registry.cursor() as cr:
+            return self._check_database_load(cr)
+
+    def _check_database_load(self, cr):
+        """ Return True if active connections or replication lag read on cr are
+        over their limit.
+        """
+        if self.max_active_connections:
+            cr.execute("""
+                SELECT count(*) FROM pg_stat_activity
+                WHERE datname = current_database()
+                    AND state = 'active'
+                    AND pid != pg_backend_pid()
+            """)
+            active_connections = cr.fetchone()[0]
+            if active_connections > self.max_active_connections:
+                _logger.info(
+                    'Migration throttled, %s active connections over %s.',
+                    active_connections, self.max_active_connections)
+                return True
+
+        if self.max_replication_lag:
+            cr.execute("""
+                SELECT COALESCE(EXTRACT(EPOCH FROM max(replay_lag)), 0)
+                FROM pg_stat_replication
+            """)
+            replication_lag = cr.fetchone()[0]
+            if replication_lag > self.max_replication_lag:
+                _logger.info(
+                    'Migration throttled, replication lag %.1fs over %.1fs.',
+                    replication_lag, self.max_replication_lag)
+                return True
+
+        return False
+
+    def _sleep(self, duration):
+        if duration > 0:
+            time.sleep(duration)
+            self.throttled_time += duration